@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'user',
     'recipe',
@@ -46,7 +47,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.QueryInstrumentationMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -79,17 +84,102 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DB_POOL=1 shares connections between threads through an in-process pool.
+# Django then closes connections after every request (CONN_MAX_AGE 0), which
+# hands them back to the pool. Otherwise each thread keeps its connection
+# open for DB_CONN_MAX_AGE seconds.
+DB_POOL = os.environ.get('DB_POOL', '') == '1'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': ('core.db.backends.postgresql_pool' if DB_POOL
+                   else 'django.db.backends.postgresql'),
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        # Seconds before giving up on opening a connection.
+        'OPTIONS': {'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5))},
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'MAX_IDLE': int(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+        },
+    }
+}
+
+# Read replicas: a comma-separated list of hosts sharing the default
+# database's name and credentials. Safe requests read from them round-robin
+# through core.db.routers.ReplicaRouter. The test runner treats them as
+# mirrors of default, so tests need no second database.
+DB_REPLICA_HOSTS = [
+    host.strip() for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',')
+    if host.strip()
+]
+DB_REPLICAS = ['replica%d' % number for number in range(1, len(DB_REPLICA_HOSTS) + 1)]
+DATABASES.update({
+    alias: dict(DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'})
+    for alias, host in zip(DB_REPLICAS, DB_REPLICA_HOSTS)
+})
+
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+# Seconds a client reads from the primary after a write.
+DB_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+# Must be shared by every worker, such as Redis or Memcached; a system check
+# (core.E001) rejects the local memory default when replicas are configured.
+DB_REPLICA_STICKY_CACHE_ALIAS = os.environ.get(
+    'DB_REPLICA_STICKY_CACHE_ALIAS', 'default')
+# Replicas further behind than this many seconds are skipped.
+DB_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 2))
+DB_REPLICA_LAG_CHECK_INTERVAL = float(
+    os.environ.get('DB_REPLICA_LAG_CHECK_INTERVAL', 1))
+
+# Readiness endpoint: 'select' runs SELECT 1 on every database, 'tcp' only
+# opens a socket to each server.
+READINESS_PROBE = os.environ.get('READINESS_PROBE', 'select')
+READINESS_TIMEOUT = float(os.environ.get('READINESS_TIMEOUT', 2))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.2/topics/auth/passwords/
+
+PASSWORD_HASHERS = [
+    'core.hashing.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# PBKDF2 work factor; existing hashes are upgraded when their owner logs in.
+PASSWORD_HASHER_ITERATIONS = int(
+    os.environ.get('PASSWORD_HASHER_ITERATIONS', 600000))
+# Hashing runs on this many threads, with up to MAX_PENDING more calls
+# waiting at most QUEUE_TIMEOUT seconds before a 503.
+PASSWORD_HASHING_WORKERS = int(
+    os.environ.get('PASSWORD_HASHING_WORKERS', os.cpu_count() or 1))
+PASSWORD_HASHING_MAX_PENDING = int(
+    os.environ.get('PASSWORD_HASHING_MAX_PENDING', 16))
+PASSWORD_HASHING_QUEUE_TIMEOUT = float(
+    os.environ.get('PASSWORD_HASHING_QUEUE_TIMEOUT', 0.5))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -133,6 +223,114 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+# Token auth cache
+# https://www.django-rest-framework.org/api-guide/authentication/#tokenauthentication
+
+TOKEN_AUTH_CACHE_SIZE = int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000))
+TOKEN_AUTH_CACHE_TTL = int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60))
+# Name of a Django cache shared between processes, or empty for in-process
+TOKEN_AUTH_CACHE_ALIAS = os.environ.get('TOKEN_AUTH_CACHE_ALIAS', '')
+
+# Login endpoint: (burst, refills per minute) token buckets per client IP
+# and per email, and how long an issued token is reused without a query.
+# (burst, per minute) for each scope, both must be positive (core.E002).
+LOGIN_THROTTLE_RATES = {
+    'ip': (
+        int(os.environ.get('LOGIN_THROTTLE_IP_BURST', 30)),
+        float(os.environ.get('LOGIN_THROTTLE_IP_PER_MINUTE', 30)),
+    ),
+    'email': (
+        int(os.environ.get('LOGIN_THROTTLE_EMAIL_BURST', 5)),
+        float(os.environ.get('LOGIN_THROTTLE_EMAIL_PER_MINUTE', 5)),
+    ),
+}
+LOGIN_THROTTLE_MAX_KEYS = int(os.environ.get('LOGIN_THROTTLE_MAX_KEYS', 100000))
+# Cache alias shared by all processes; empty keeps the buckets in-process.
+LOGIN_THROTTLE_CACHE_ALIAS = os.environ.get('LOGIN_THROTTLE_CACHE_ALIAS', '')
+LOGIN_TOKEN_CACHE_TTL = int(os.environ.get('LOGIN_TOKEN_CACHE_TTL', 60))
+
+# JSON is encoded and decoded with orjson when it is installed; set these to
+# rest_framework.renderers.JSONRenderer / rest_framework.parsers.JSONParser
+# to use the stdlib json module instead.
+JSON_RENDERER_CLASS = os.environ.get(
+    'JSON_RENDERER_CLASS', 'core.renderers.FastJSONRenderer')
+JSON_PARSER_CLASS = os.environ.get(
+    'JSON_PARSER_CLASS', 'core.parsers.FastJSONParser')
+
+# Serve recipe and user reads from native async views; app/asgi.py turns
+# this on, under WSGI the sync views are used.
+API_ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS', '') == '1'
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_RENDERER_CLASSES': [
+        JSON_RENDERER_CLASS,
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        JSON_PARSER_CLASS,
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Reverse proxies in front of the app appending to X-Forwarded-For.
+    # Client addresses, e.g. for the login throttle, are taken that many
+    # hops from the end of the header, or from REMOTE_ADDR with 0; clients
+    # can forge the rest of the header.
+    'NUM_PROXIES': int(os.environ.get('API_NUM_PROXIES', 0)),
+}
+
+# Query instrumentation: per-request query counts and SQL time are sent in
+# a Server-Timing header and logged to 'core.queries' for a sample of
+# requests. Views running more queries than their budget (QUERY_BUDGETS by
+# URL name, else the view's query_budget) are logged as warnings, or fail
+# with QUERY_BUDGET_MODE=raise.
+QUERY_SERVER_TIMING = os.environ.get('QUERY_SERVER_TIMING', '1') == '1'
+QUERY_LOG_SAMPLE_RATE = float(os.environ.get('QUERY_LOG_SAMPLE_RATE', 0.01))
+QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'warn')
+QUERY_BUDGETS = {}
+
+# Metrics served at /metrics. Set METRICS_MULTIPROC_DIR to a directory
+# shared by the worker processes, emptied when the server starts, to report
+# the totals of all of them. METRICS_TOKEN requires scrapers to send it as
+# a bearer token.
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Recipe API
+RECIPE_PAGE_SIZE = int(os.environ.get('RECIPE_PAGE_SIZE', 50))
+RECIPE_MAX_PAGE_SIZE = int(os.environ.get('RECIPE_MAX_PAGE_SIZE', 500))
+RECIPE_CACHE_ALIAS = os.environ.get('RECIPE_CACHE_ALIAS', 'default')
+RECIPE_CACHE_TTL = int(os.environ.get('RECIPE_CACHE_TTL', 300))
+RECIPE_AUTOCOMPLETE_LIMIT = int(os.environ.get('RECIPE_AUTOCOMPLETE_LIMIT', 10))
+RECIPE_AUTOCOMPLETE_MAX_LIMIT = int(
+    os.environ.get('RECIPE_AUTOCOMPLETE_MAX_LIMIT', 50))
+RECIPE_BULK_MAX_ITEMS = int(os.environ.get('RECIPE_BULK_MAX_ITEMS', 500))
+RECIPE_EXPORT_CHUNK_SIZE = int(os.environ.get('RECIPE_EXPORT_CHUNK_SIZE', 2000))
+RECIPE_SYNC_OVERLAP_SECONDS = int(os.environ.get('RECIPE_SYNC_OVERLAP_SECONDS', 5))
+RECIPE_SYNC_PAGE_SIZE = int(os.environ.get('RECIPE_SYNC_PAGE_SIZE', 500))
+# Older tombstones are removed by the prune_tombstones command.
+RECIPE_TOMBSTONE_RETENTION_DAYS = int(
+    os.environ.get('RECIPE_TOMBSTONE_RETENTION_DAYS', 30))
+
+# Response compression
+
+# Codings in server preference order, used when the client weights them equally.
+COMPRESSION_ENCODINGS = os.environ.get(
+    'COMPRESSION_ENCODINGS', 'br,zstd,gzip').split(',')
+COMPRESSION_LEVELS = {
+    'gzip': int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6)),
+    'br': int(os.environ.get('COMPRESSION_BROTLI_LEVEL', 4)),
+    'zstd': int(os.environ.get('COMPRESSION_ZSTD_LEVEL', 3)),
 }
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_STREAM_FLUSH_SIZE = int(
+    os.environ.get('COMPRESSION_STREAM_FLUSH_SIZE', 64 * 1024))
+COMPRESSION_CONTENT_TYPES = [
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'application/xml',
+    'application/vnd.oai.openapi',
+    'application/vnd.oai.openapi+json',
+]
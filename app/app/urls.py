@@ -8,8 +8,12 @@ from drf_spectacular.views import (
     SpectacularSwaggerView
 )
 
+from core import views as core_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/health/ready/', core_views.readiness, name='readiness'),
+    path('metrics', core_views.export_metrics, name='metrics'),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
     path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
@@ -0,0 +1,116 @@
+"""
+Native async read paths for DRF views.
+
+DRF 3.14 views are synchronous, so under ASGI every request is handed to a
+worker thread. AsyncReadMixin gives a view a coroutine endpoint serving GET
+and HEAD through `a<action>` handlers (e.g. `alist`) that use the async ORM,
+and forwards every other request to the regular sync view.
+"""
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+
+
+class AsyncReadMixin:
+    """Serve reads with async handlers when API_ASYNC_VIEWS is enabled.
+
+    The async endpoint only renders JSON; requests negotiating any other
+    renderer, such as the browsable API, go to the sync view.
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        """Return the async endpoint, or the sync view when disabled."""
+        if actions is None:
+            sync_view = super().as_view(**initkwargs)
+            name = 'aget'
+        else:
+            if 'get' in actions:
+                actions.setdefault('head', actions['get'])
+            sync_view = super().as_view(actions, **initkwargs)
+            name = 'a%s' % actions.get('get')
+        if not settings.API_ASYNC_VIEWS or not hasattr(cls, name):
+            return sync_view
+        handlers = {'get': name, 'head': name}
+        forward = sync_to_async(sync_view)
+
+        async def view(request, *args, **kwargs):
+            handler = handlers.get(request.method.lower())
+            if handler is None:
+                return await forward(request, *args, **kwargs)
+
+            self = cls(**initkwargs)
+            if actions is None:
+                self.setup(request, *args, **kwargs)
+            else:
+                # Same binding as ViewSetMixin.as_view.
+                self.action_map = actions
+                for method, action in actions.items():
+                    setattr(self, method, getattr(self, action))
+                self.request = request
+                self.args = args
+                self.kwargs = kwargs
+
+            request = self.initialize_request(request, *args, **kwargs)
+            self.format_kwarg = self.get_format_suffix(**kwargs)
+            if not self.renders_json(request):
+                return await forward(request._request, *args, **kwargs)
+            return await self.adispatch(
+                request, getattr(self, handler), *args, **kwargs)
+
+        update_wrapper(view, cls, updated=())
+        # Keep what schema generation and URL introspection read off views.
+        for attr in ('cls', 'initkwargs', 'actions', 'csrf_exempt'):
+            if hasattr(sync_view, attr):
+                setattr(view, attr, getattr(sync_view, attr))
+        return view
+
+    def renders_json(self, request):
+        """Return whether content negotiation picks a JSON renderer."""
+        try:
+            renderer, _ = self.perform_content_negotiation(request)
+        except exceptions.APIException:
+            return False
+        return isinstance(renderer, JSONRenderer)
+
+    async def aperform_authentication(self, request):
+        """Authenticate the request, awaiting `aauthenticate` if available."""
+        for authenticator in request.authenticators:
+            authenticate = getattr(authenticator, 'aauthenticate', None)
+            if authenticate is None:
+                authenticate = sync_to_async(authenticator.authenticate)
+            try:
+                user_auth_tuple = await authenticate(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    async def afinalize_response(self, request, response, *args, **kwargs):
+        """Async variant of `finalize_response`, for views doing I/O there."""
+        return self.finalize_response(request, response, *args, **kwargs)
+
+    async def adispatch(self, request, handler, *args, **kwargs):
+        """Async counterpart of `APIView.dispatch` for a single handler."""
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await self.aperform_authentication(request)
+            self.initial(request, *args, **kwargs)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = await self.afinalize_response(
+            request, response, *args, **kwargs)
+        if hasattr(self.response, 'render'):
+            # Rendering is CPU only, spare Django a hop through a thread.
+            self.response.render()
+        return self.response
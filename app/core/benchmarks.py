@@ -0,0 +1,291 @@
+"""
+Reproducible benchmark scenarios for the API.
+
+Each scenario is a factory taking a Context and returning a callable that
+performs one operation, usually one request through the Django test client.
+The concurrent runners instead fire many simultaneous requests at the WSGI
+or ASGI handler, to compare how both servers cope with a burst of clients.
+"""
+import asyncio
+import io
+import itertools
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.management.commands.seed_data import SEED_PASSWORD, make_recipe
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+from recipe.serializers import (
+    RecipeDetailSerializer,
+    RecipeFastSerializer,
+    RecipeSerializer,
+)
+from user.throttling import login_buckets
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    """Register a scenario factory under a name."""
+    def register(factory):
+        SCENARIOS[name] = factory
+        return factory
+    return register
+
+
+class Context:
+    """Shared state for scenarios: a seeded user and an API client."""
+
+    def __init__(self):
+        token = (Token.objects.select_related('user')
+                 .filter(user__email__startswith='seed-user-')
+                 .annotate(recipes=Count('user__recipe'))
+                 .order_by('-recipes').first())
+        if token is None:
+            raise RuntimeError('No seed data, run seed_data first.')
+        self.user = token.user
+        self.token = token.key
+        self.client = Client(
+            HTTP_HOST='localhost',
+            HTTP_AUTHORIZATION='Token %s' % token.key,
+        )
+        self.anonymous = Client(HTTP_HOST='localhost')
+        self.recipe_ids = list(
+            self.user.recipe_set.order_by('-id').values_list('id', flat=True))
+
+
+def percentile(samples, fraction):
+    """Return the nearest-rank percentile of sorted samples."""
+    index = max(0, min(len(samples) - 1, round(fraction * len(samples)) - 1))
+    return samples[index]
+
+
+def run(name, context, iterations, warmup=10):
+    """Run a scenario and return its latency and query statistics."""
+    operation = SCENARIOS[name](context)
+    for _ in range(warmup):
+        operation()
+
+    latencies = []
+    queries = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            begin = time.perf_counter()
+            operation()
+            latencies.append(time.perf_counter() - begin)
+        queries += len(captured)
+    elapsed = time.perf_counter() - started
+
+    stats = summarize(latencies, elapsed)
+    stats['queries_per_request'] = queries / iterations
+    return stats
+
+
+def summarize(latencies, elapsed):
+    """Return latency percentiles and throughput of timed operations."""
+    latencies = sorted(latencies)
+    return {
+        'iterations': len(latencies),
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'requests_per_second': len(latencies) / elapsed,
+    }
+
+
+def concurrent_wsgi(context, path, params, connections, threads):
+    """Send `connections` simultaneous requests to a threaded WSGI handler.
+
+    Like a threaded WSGI server, at most `threads` requests are served at
+    once and the rest queue; latency is measured from arrival.
+    """
+    handler = WSGIHandler()
+    factory = RequestFactory()
+
+    def request(arrived):
+        environ = factory.get(
+            path, params, headers={'authorization': 'Token %s' % context.token},
+            SERVER_NAME='localhost').environ
+        statuses = []
+        body = handler(environ, lambda status, headers: statuses.append(status))
+        for _ in body:
+            pass
+        body.close()
+        return time.perf_counter() - arrived, statuses[0].startswith('200')
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(request, [started] * connections))
+    return concurrent_stats(results, time.perf_counter() - started)
+
+
+def concurrent_asgi(context, path, params, connections):
+    """Send `connections` simultaneous requests to the ASGI handler."""
+    handler = ASGIHandler()
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'query_string': urlencode(params).encode(),
+        'headers': [
+            (b'host', b'localhost'),
+            (b'authorization', b'Token %s' % context.token.encode()),
+        ],
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 0),
+    }
+
+    async def request(started):
+        statuses = []
+        disconnected = asyncio.Event()
+
+        async def receive():
+            if not statuses:
+                statuses.append(None)
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        await handler(dict(scope), receive, send)
+        disconnected.set()
+        return time.perf_counter() - started, statuses[-1] == 200
+
+    async def burst():
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *[request(started) for _ in range(connections)])
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(burst())
+    return concurrent_stats(results, elapsed)
+
+
+def concurrent_stats(results, elapsed):
+    """Summarize (latency, ok) results of a burst of requests."""
+    stats = summarize([latency for latency, _ok in results], elapsed)
+    stats['errors'] = sum(1 for _latency, ok in results if not ok)
+    return stats
+
+
+@scenario('recipe-list')
+def recipe_list(context):
+    url = reverse('recipe:recipe-list')
+    return lambda: context.client.get(url)
+
+
+@scenario('recipe-list-page')
+def recipe_list_page(context):
+    url = reverse('recipe:recipe-list')
+    return lambda: context.client.get(url, {'page_size': 50})
+
+
+@scenario('recipe-detail')
+def recipe_detail(context):
+    ids = context.recipe_ids or [0]
+    position = itertools.count()
+
+    def operation():
+        pk = ids[next(position) % len(ids)]
+        context.client.get(reverse('recipe:recipe-detail', args=[pk]))
+    return operation
+
+
+@scenario('recipe-autocomplete')
+def recipe_autocomplete(context):
+    url = reverse('recipe:recipe-autocomplete')
+    return lambda: context.client.get(url, {'q': 'tomato', 'limit': 10})
+
+
+@scenario('recipe-export')
+def recipe_export(context):
+    url = reverse('recipe:recipe-export')
+    return lambda: b''.join(context.client.get(url).streaming_content)
+
+
+@scenario('user-me')
+def user_me(context):
+    url = reverse('user:me')
+    return lambda: context.client.get(url)
+
+
+@scenario('user-token')
+def user_token(context):
+    url = reverse('user:token')
+    payload = {'email': context.user.email, 'password': SEED_PASSWORD}
+
+    def operation():
+        # Measure the login itself, not the throttle's 429s.
+        login_buckets.clear()
+        context.anonymous.post(url, payload)
+    return operation
+
+
+@scenario('serializer-drf')
+def serializer_drf(context):
+    recipes = list(context.user.recipe_set.order_by('-id')[:1000])
+    return lambda: RecipeDetailSerializer(recipes, many=True).data
+
+
+@scenario('serializer-fast')
+def serializer_fast(context):
+    serializer = RecipeFastSerializer(RecipeDetailSerializer)
+    rows = list(context.user.recipe_set.order_by('-id')[:1000]
+                .values(*serializer.fields))
+    return lambda: serializer.many(rows)
+
+
+def recipe_payload(rows):
+    """Return a synthetic recipe list payload of the given length."""
+    rng = random.Random(rows)
+    serializer = RecipeFastSerializer(RecipeSerializer)
+    recipes = []
+    for pk in range(1, rows + 1):
+        recipe = make_recipe(rng, 1)
+        recipe.id = pk
+        recipes.append({f: getattr(recipe, f) for f in serializer.fields})
+    return serializer.many(recipes)
+
+
+def json_scenarios(label, rows):
+    """Register render and parse scenarios for a payload size."""
+    for name, renderer_class in [('stdlib', JSONRenderer),
+                                 ('fast', FastJSONRenderer)]:
+        @scenario('render-%s-%s' % (name, label))
+        def render(context, renderer_class=renderer_class):
+            data = recipe_payload(rows)
+            return lambda: renderer_class().render(data)
+
+    for name, parser_class in [('stdlib', JSONParser),
+                               ('fast', FastJSONParser)]:
+        @scenario('parse-%s-%s' % (name, label))
+        def parse(context, parser_class=parser_class):
+            body = JSONRenderer().render(recipe_payload(rows))
+            return lambda: parser_class().parse(
+                io.BytesIO(body), parser_context={'encoding': 'utf-8'})
+
+
+for label, rows in [('1k', 1000), ('10k', 10000), ('100k', 100000)]:
+    json_scenarios(label, rows)
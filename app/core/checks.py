@@ -0,0 +1,44 @@
+"""
+System checks for settings that only work together.
+"""
+from django.conf import settings
+from django.core import checks
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@checks.register()
+def check_replica_sticky_cache(app_configs, **kwargs):
+    """Require a shared cache for replica stickiness."""
+    if not settings.DB_REPLICAS:
+        return []
+    alias = settings.DB_REPLICA_STICKY_CACHE_ALIAS
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [checks.Error(
+        "DB_REPLICA_STICKY_CACHE_ALIAS '%s' uses %s, which is not shared "
+        "between processes." % (alias, backend),
+        hint='A write served by one worker would not pin the client to the '
+             'primary in the others. Point the alias at a shared cache such '
+             'as Redis or Memcached.',
+        id='core.E001',
+    )]
+
+
+@checks.register()
+def check_login_throttle_rates(app_configs, **kwargs):
+    """Require a positive burst and refill rate for every login throttle."""
+    errors = []
+    for scope, (capacity, per_minute) in settings.LOGIN_THROTTLE_RATES.items():
+        if capacity < 1 or per_minute <= 0:
+            errors.append(checks.Error(
+                "LOGIN_THROTTLE_RATES['%s'] is (%s, %s), the burst must be at "
+                "least 1 and the rate per minute positive." % (
+                    scope, capacity, per_minute),
+                id='core.E002',
+            ))
+    return errors
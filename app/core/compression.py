@@ -0,0 +1,139 @@
+"""
+Content codings for response compression.
+
+gzip is always available; brotli and zstd are offered when the `brotli`
+and `zstandard` packages are installed.
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+class GzipCompressor:
+    """Incremental gzip compressor."""
+
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    """Incremental brotli compressor."""
+
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+class ZstdCompressor:
+    """Incremental zstd compressor."""
+
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def available_codings():
+    """Return the compressor class of each coding this process supports."""
+    codings = {'gzip': GzipCompressor}
+    if brotli is not None:
+        codings['br'] = BrotliCompressor
+    if zstandard is not None:
+        codings['zstd'] = ZstdCompressor
+    return codings
+
+
+def parse_accept_encoding(header):
+    """Return the codings of an Accept-Encoding header with their q-values."""
+    accepted = {}
+    for item in header.split(','):
+        coding, *params = item.split(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(header, preference):
+    """Return the preferred coding the client accepts, or None.
+
+    The client's q-values decide first; among equally weighted codings the
+    server preference order wins.
+    """
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for coding in preference:
+        quality = accepted.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress_sequence(compressor, sequence, flush_size):
+    """Compress an iterable of bytes, flushing every flush_size input bytes."""
+    pending = 0
+    for chunk in sequence:
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_size:
+            data += compressor.flush()
+            pending = 0
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_sequence(compressor, sequence, flush_size):
+    """Compress an async iterable of bytes like compress_sequence."""
+    pending = 0
+    async for chunk in sequence:
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_size:
+            data += compressor.flush()
+            pending = 0
+        if data:
+            yield data
+    yield compressor.finish()
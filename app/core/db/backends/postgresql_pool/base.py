@@ -0,0 +1,106 @@
+"""
+PostgreSQL backend borrowing connections from an in-process pool.
+
+Configure with ENGINE 'core.db.backends.postgresql_pool' and a POOL dict in
+the database settings (MAX_SIZE, MAX_IDLE, TIMEOUT). Closing a connection,
+which Django does at the end of every request when CONN_MAX_AGE is 0,
+returns it to the pool instead of disconnecting.
+"""
+import os
+import threading
+
+from django.db.backends.postgresql import base
+
+from core import metrics
+from core.db.pool import ConnectionPool, PoolTimeout
+
+TRANSACTION_STATUS_IDLE = 0
+TRANSACTION_STATUS_UNKNOWN = 4
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def reset_connection(connection):
+    """Roll back a released connection, returning whether it is reusable."""
+    if connection.closed:
+        return False
+    status = connection.info.transaction_status
+    if status == TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    return True
+
+
+def ping(connection):
+    """Return whether an idle connection still answers."""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    return True
+
+
+def pool_stats():
+    """Return the connection gauges of this process's pools."""
+    for alias, pool in list(_pools.items()):
+        if pool.pid != os.getpid():
+            continue
+        stats = pool.stats()
+        yield 'db_pool_connections', {'alias': alias}, stats['size']
+        yield 'db_pool_idle_connections', {'alias': alias}, stats['idle']
+        yield 'db_pool_max_connections', {'alias': alias}, stats['max_size']
+
+
+metrics.register_collector(pool_stats)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL DatabaseWrapper sharing a pool of connections per alias."""
+
+    @property
+    def pool(self):
+        """Return this process's pool for the alias, creating it if needed."""
+        pool = _pools.get(self.alias)
+        if pool is not None and pool.pid == os.getpid():
+            return pool
+        with _pools_lock:
+            pool = _pools.get(self.alias)
+            # Connections inherited over fork belong to the parent.
+            if pool is None or pool.pid != os.getpid():
+                options = self.settings_dict.get('POOL', {})
+                pool = ConnectionPool(
+                    None,
+                    reset_connection,
+                    max_size=options.get('MAX_SIZE', 10),
+                    max_idle=options.get('MAX_IDLE', 300),
+                    timeout=options.get('TIMEOUT', 5),
+                    check=ping if self.settings_dict['CONN_HEALTH_CHECKS'] else None,
+                )
+                _pools[self.alias] = pool
+        return pool
+
+    def get_new_connection(self, conn_params):
+        """Borrow a connection from the pool."""
+        def connect():
+            return super(DatabaseWrapper, self).get_new_connection(conn_params)
+        try:
+            connection = self.pool.acquire(connect)
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc))
+        # Reused connections keep the isolation level set when opened.
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = base.IsolationLevel(options.get(
+            'isolation_level', base.IsolationLevel.READ_COMMITTED))
+        return connection
+
+    def _close(self):
+        """Return the connection to the pool."""
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # Django keeps using the object until the atomic block
+                # exits, so it cannot be handed to another thread.
+                self.pool.close(self.connection)
+            else:
+                self.pool.release(self.connection)
@@ -0,0 +1,85 @@
+"""
+Count queries and SQL time through connection execute wrappers.
+
+Every connection gets one permanent execute wrapper, which reports to the
+QueryStats of the record_queries() blocks active in the current context.
+Connections belong to threads, but the context follows a request into the
+threads sync_to_async runs its queries on.
+"""
+import contextlib
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_active = ContextVar('query_stats', default=())
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a request runs more queries than its view allows."""
+
+
+class QueryStats:
+    """The number, time and text of the queries run in a block."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def add(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        """Return how many queries repeated an earlier statement.
+
+        Statements are compared without their parameters, so N+1 lookups
+        count as duplicates.
+        """
+        return self.count - len(self.statements)
+
+    def repeated(self):
+        """Return (sql, count) for statements run more than once."""
+        return [(sql, n) for sql, n in self.statements.most_common() if n > 1]
+
+
+def instrument(execute, sql, params, many, context):
+    """Execute wrapper timing the query for every active QueryStats."""
+    active = _active.get()
+    if not active:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        for stats in active:
+            stats.add(sql, duration)
+
+
+@receiver(connection_created)
+def install(connection, **kwargs):
+    """Add the instrument wrapper to a connection once."""
+    if instrument not in connection.execute_wrappers:
+        # First, so the pop() of connection.execute_wrapper() blocks
+        # entered earlier still removes their own wrapper.
+        connection.execute_wrappers.insert(0, instrument)
+
+
+@contextlib.contextmanager
+def record_queries():
+    """Record the queries run on every database inside the block."""
+    for alias in connections:
+        install(connections[alias])
+    stats = QueryStats()
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
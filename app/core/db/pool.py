@@ -0,0 +1,149 @@
+"""
+A small thread-safe connection pool.
+
+Django keeps one database connection per thread. Under ASGI and threaded
+servers threads come and go, so persistent connections pile up or get
+reopened on every request. Closing a connection of the pooled backend
+hands it back here instead, for the next thread to reuse.
+"""
+import os
+import threading
+import time
+
+from core import metrics
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became free in time."""
+
+
+class ConnectionPool:
+    """Bounded LIFO pool of DB-API connections.
+
+    `connect` opens a new connection, `reset` returns whether a released
+    connection can be reused (rolling back any open transaction) and the
+    optional `check` whether an idle connection is still alive.
+    Connections idle for longer than `max_idle` seconds are closed.
+    """
+
+    def __init__(self, connect, reset, *, max_size, max_idle, timeout,
+                 check=None):
+        self.connect = connect
+        self.reset = reset
+        self.check = check
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self.size = 0
+        self._idle = []
+        self._lock = threading.Condition()
+
+    def acquire(self, connect=None):
+        """Return an idle connection, a new one, or wait for a release.
+
+        `connect` overrides the pool's connect function for this call.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._lock:
+            while True:
+                self.evict_idle()
+                if self._idle:
+                    connection, _released = self._idle.pop()
+                    break
+                if self.size < self.max_size:
+                    self.size += 1
+                    connection = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    metrics.increment('db_pool_timeouts_total')
+                    raise PoolTimeout(
+                        'No database connection free after %ss.' % self.timeout)
+                self._lock.wait(remaining)
+
+        waited = time.monotonic() - started
+        metrics.increment('db_pool_acquired_total')
+        metrics.increment('db_pool_wait_seconds_total', waited)
+        if connection is not None:
+            if self.is_alive(connection):
+                return connection
+            # Reopen in the same slot.
+            self.dispose(connection)
+        return self.open(connect or self.connect)
+
+    def is_alive(self, connection):
+        """Return whether an idle connection passes the health check."""
+        if self.check is None:
+            return True
+        try:
+            return self.check(connection)
+        except Exception:
+            return False
+
+    def open(self, connect):
+        """Open a connection for a slot already counted in `size`."""
+        try:
+            connection = connect()
+        except BaseException:
+            self.forget()
+            raise
+        metrics.increment('db_pool_connections_opened_total')
+        return connection
+
+    def release(self, connection):
+        """Put a connection back, or close it if it cannot be reused."""
+        try:
+            reusable = self.reset(connection)
+        except Exception:
+            reusable = False
+        if not reusable:
+            self.close(connection)
+            return
+        with self._lock:
+            self._idle.append((connection, time.monotonic()))
+            self._lock.notify()
+
+    def close(self, connection):
+        """Close a connection and free its slot."""
+        self.dispose(connection)
+        self.forget()
+
+    def dispose(self, connection):
+        """Close a connection, ignoring errors from a broken one."""
+        try:
+            connection.close()
+        except Exception:
+            pass
+        metrics.increment('db_pool_connections_closed_total')
+
+    def forget(self):
+        """Free a slot whose connection is gone."""
+        with self._lock:
+            self.size -= 1
+            self._lock.notify()
+
+    def evict_idle(self):
+        """Close connections idle for longer than max_idle; needs the lock."""
+        cutoff = time.monotonic() - self.max_idle
+        # The list is oldest first, since connections are reused LIFO.
+        while self._idle and self._idle[0][1] < cutoff:
+            connection, _released = self._idle.pop(0)
+            self.size -= 1
+            self.dispose(connection)
+            metrics.increment('db_pool_connections_evicted_total')
+
+    def stats(self):
+        """Return the current number of open and idle connections."""
+        with self._lock:
+            return {'size': self.size, 'idle': len(self._idle),
+                    'max_size': self.max_size}
+
+    def close_all(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self.size -= len(idle)
+        for connection, _released in idle:
+            self.dispose(connection)
@@ -0,0 +1,65 @@
+"""
+Lightweight checks that the databases accept connections.
+
+`select` opens a connection and runs SELECT 1. `tcp` only opens a socket to
+the database server, which is enough to know it is listening; databases
+without a host, such as SQLite, fall back to `select`.
+
+probe_all() gives up on probes still running after the timeout, such as a
+connection attempt to a host that drops packets.
+"""
+import socket
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.db import connections
+
+PROBES = ('select', 'tcp')
+
+
+def probe_select(alias, timeout):
+    """Run SELECT 1 on a fresh connection to the database."""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    finally:
+        connection.close()
+
+
+def probe_tcp(alias, timeout):
+    """Open and close a TCP connection to the database server."""
+    settings_dict = connections.settings[alias]
+    host = settings_dict.get('HOST')
+    if not host or host.startswith('/'):
+        return probe_select(alias, timeout)
+    port = int(settings_dict.get('PORT') or 5432)
+    socket.create_connection((host, port), timeout=timeout).close()
+
+
+def probe(alias, mode='select', timeout=2):
+    """Return None if the database is reachable, else the error message."""
+    func = probe_tcp if mode == 'tcp' else probe_select
+    try:
+        func(alias, timeout)
+    except Exception as exc:
+        return str(exc) or exc.__class__.__name__
+    return None
+
+
+def probe_all(aliases, func=probe, timeout=None, **kwargs):
+    """Probe the databases in parallel, return {alias: error or None}.
+
+    func is called with the timeout too, None waits for every probe.
+    """
+    aliases = list(aliases)
+    executor = ThreadPoolExecutor(max_workers=max(len(aliases), 1))
+    futures = [executor.submit(func, alias, timeout=timeout, **kwargs)
+               for alias in aliases]
+    done, _not_done = wait(futures, timeout)
+    # Probes that hang are left to fail on their own worker thread.
+    executor.shutdown(wait=False)
+    return {
+        alias: future.result() if future in done else 'Timed out after %gs' % timeout
+        for alias, future in zip(aliases, futures)
+    }
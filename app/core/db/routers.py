@@ -0,0 +1,136 @@
+"""
+Route safe reads to read replicas.
+
+Replicas are the aliases listed in DB_REPLICAS. Reads go to them round-robin
+only while ReplicaRoutingMiddleware marks the current request as a safe one
+(GET, HEAD or OPTIONS) from a client that has not written recently. Anything
+else, including management commands, writes and reads inside a transaction,
+uses the primary. A replica lagging more than DB_REPLICA_MAX_LAG seconds
+behind is skipped, and the primary serves the read when all of them are.
+"""
+import contextlib
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from core import metrics
+
+# Zero when the replica has replayed everything it received, so an idle
+# primary does not look like lag.
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+# True while the current request may read from replicas.
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextlib.contextmanager
+def use_primary():
+    """Send every read in the block to the primary."""
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def pin_authorization(request, authorization):
+    """Pin a client sending this Authorization header to the primary.
+
+    For views handing out credentials, such as a login, whose first use
+    comes from a client that did not send them with the write.
+    """
+    pinned = getattr(request, 'pinned_authorizations', [])
+    request.pinned_authorizations = pinned + [authorization]
+
+
+def measure_lag(alias):
+    """Return how many seconds the replica is behind the primary."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_SQL)
+        lag = cursor.fetchone()[0]
+    return float(lag or 0)
+
+
+class ReplicaLag:
+    """Replication lag per replica, measured at most once per interval."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._measured = {}
+
+    def get(self, alias):
+        """Return the last measured lag of the replica, refreshing it if due."""
+        now = time.monotonic()
+        with self._lock:
+            lag, measured_at = self._measured.get(alias, (None, None))
+        if lag is not None and now - measured_at < settings.DB_REPLICA_LAG_CHECK_INTERVAL:
+            return lag
+        try:
+            lag = measure_lag(alias)
+        except DatabaseError:
+            metrics.increment('db_replica_errors_total')
+            lag = float('inf')
+        with self._lock:
+            self._measured[alias] = (lag, now)
+        return lag
+
+    def clear(self):
+        """Forget every measurement."""
+        with self._lock:
+            self._measured.clear()
+
+
+replica_lag = ReplicaLag()
+
+
+class ReplicaRouter:
+    """Database router sending safe reads to replicas and the rest to default."""
+
+    def __init__(self):
+        self._counter = itertools.count()
+
+    def db_for_read(self, model, **hints):
+        """Return the next replica that is not lagging, or the primary."""
+        replicas = settings.DB_REPLICAS
+        if not replicas or not replica_reads.get():
+            return DEFAULT_DB_ALIAS
+        # Reads after a write in the same transaction must see it.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        start = next(self._counter)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if replica_lag.get(alias) <= settings.DB_REPLICA_MAX_LAG:
+                metrics.increment('db_replica_reads_total')
+                return alias
+            metrics.increment('db_replica_lagging_total')
+        metrics.increment('db_replica_fallback_total')
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Replicas hold the same rows as the primary."""
+        aliases = {DEFAULT_DB_ALIAS, *settings.DB_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Replicas receive the schema through replication."""
+        return db not in settings.DB_REPLICAS
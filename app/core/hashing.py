@@ -0,0 +1,120 @@
+"""
+Password hashing on a bounded worker pool.
+
+PBKDF2 costs hundreds of milliseconds of CPU per call. Running it on the
+request thread lets a burst of sign-ups or logins starve every other
+request, so hashing and verification run on a small thread pool instead
+(hashlib releases the GIL while hashing). When the pool and its queue are
+full, callers get HashingUnavailable (503) instead of waiting in line.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core import metrics
+
+
+class HashingUnavailable(APIException):
+    """Raised when too many passwords are already being hashed."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many sign-in attempts in progress, try again shortly.')
+    default_code = 'hashing_unavailable'
+    wait = 1
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the PASSWORD_HASHER_ITERATIONS work factor.
+
+    Hashes with another iteration count are upgraded on the next login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHER_ITERATIONS
+
+
+class HashingPool:
+    """Thread pool with a bound on running plus queued jobs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+
+    def start(self):
+        """Create the executor on first use, after any worker fork."""
+        with self._lock:
+            if self._executor is None:
+                workers = settings.PASSWORD_HASHING_WORKERS
+                self._slots = threading.BoundedSemaphore(
+                    workers + settings.PASSWORD_HASHING_MAX_PENDING)
+                self._executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix='hashing')
+        return self._executor
+
+    def run(self, func, *args):
+        """Run func on the pool and return its result, or raise if full."""
+        executor = self.start()
+        if not self._slots.acquire(timeout=settings.PASSWORD_HASHING_QUEUE_TIMEOUT):
+            metrics.increment('password_hashing_rejected_total')
+            raise HashingUnavailable()
+        try:
+            metrics.increment('password_hashing_total')
+            return executor.submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        """Stop the workers, a new pool is started on next use."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+            self._executor = None
+
+
+pool = HashingPool()
+
+
+@receiver(setting_changed)
+def reset_pool(*, setting, **kwargs):
+    """Restart the pool when its settings change, e.g. in tests."""
+    if setting.startswith('PASSWORD_HASHING_'):
+        pool.shutdown()
+
+
+def make_password(password):
+    """Return the encoded hash of a password, hashed on the pool."""
+    if password is None:
+        return hashers.make_password(None)
+    return pool.run(hashers.make_password, password)
+
+
+def verify_password(password, encoded):
+    """Return (is_correct, new_encoded) for a password.
+
+    new_encoded is the password hashed with the preferred hasher when the
+    stored hash is outdated, otherwise None. Both hashes are computed in
+    the same pool job so a login never needs a second slot.
+    """
+    rehash = []
+    is_correct = hashers.check_password(password, encoded, rehash.append)
+    return is_correct, hashers.make_password(password) if rehash else None
+
+
+def check_password(password, encoded, update=None):
+    """Return whether password matches encoded, verifying on the pool.
+
+    `update` is called on the calling thread with the new encoded hash when
+    the stored one must be upgraded, so database writes stay off the pool.
+    """
+    is_correct, new_encoded = pool.run(verify_password, password, encoded)
+    if update is not None and new_encoded is not None:
+        update(new_encoded)
+    return is_correct
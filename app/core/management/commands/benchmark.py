@@ -0,0 +1,59 @@
+"""
+Django command to run the benchmark scenarios and report them as JSON.
+"""
+import json
+import platform
+import sys
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    """Django command for benchmarking the API."""
+    help = 'Run benchmark scenarios against seeded data and print JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*',
+                            help='Scenarios to run, all by default.')
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--label', default='',
+                            help='Free-form label, e.g. the git commit.')
+        parser.add_argument('--output', help='Write the report to a file.')
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        names = options['scenarios'] or sorted(benchmarks.SCENARIOS)
+        unknown = set(names) - set(benchmarks.SCENARIOS)
+        if unknown:
+            raise CommandError('Unknown scenarios: %s' % ', '.join(sorted(unknown)))
+
+        try:
+            context = benchmarks.Context()
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+
+        report = {
+            'label': options['label'],
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'platform': sys.platform,
+            },
+            'scenarios': {},
+        }
+        for name in names:
+            self.stderr.write('Running %s...' % name)
+            report['scenarios'][name] = benchmarks.run(
+                name, context, options['iterations'], options['warmup'])
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as target:
+                target.write(output + '\n')
+        self.stdout.write(output)
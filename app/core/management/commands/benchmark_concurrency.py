@@ -0,0 +1,63 @@
+"""
+Django command comparing WSGI and ASGI under many simultaneous requests.
+"""
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core import benchmarks
+
+TARGETS = {
+    'recipe-list': ('recipe:recipe-list', {}),
+    'recipe-list-page': ('recipe:recipe-list', {'page_size': 50}),
+    'user-me': ('user:me', {}),
+}
+
+
+class Command(BaseCommand):
+    """Django command for concurrency benchmarks."""
+    help = ('Fire N simultaneous requests at the WSGI and ASGI handlers and '
+            'print latency and throughput as JSON. Run with API_ASYNC_VIEWS=1 '
+            'to measure the native async views under ASGI.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=sorted(TARGETS))
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--threads', type=int, default=32,
+                            help='Worker threads of the simulated WSGI server.')
+        parser.add_argument('--server', choices=['wsgi', 'asgi', 'both'],
+                            default='both')
+        parser.add_argument('--output', help='Write the report to a file.')
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        try:
+            context = benchmarks.Context()
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+
+        name, params = TARGETS[options['target']]
+        path = reverse(name)
+        connections = options['connections']
+        report = {
+            'target': options['target'],
+            'connections': connections,
+            'async_views': settings.API_ASYNC_VIEWS,
+            'servers': {},
+        }
+        if options['server'] in ('wsgi', 'both'):
+            self.stderr.write('Running WSGI with %d threads...' % options['threads'])
+            report['servers']['wsgi'] = benchmarks.concurrent_wsgi(
+                context, path, params, connections, options['threads'])
+        if options['server'] in ('asgi', 'both'):
+            self.stderr.write('Running ASGI...')
+            report['servers']['asgi'] = benchmarks.concurrent_asgi(
+                context, path, params, connections)
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as target:
+                target.write(output + '\n')
+        self.stdout.write(output)
@@ -0,0 +1,223 @@
+"""
+Django command to import recipes in bulk from CSV or NDJSON files.
+"""
+import csv
+import io
+import json
+import os
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe
+from recipe.serializers import RecipeDetailSerializer
+from recipe.signals import touch_recipes
+
+COLUMNS = ['id', 'user_id', 'title', 'description', 'time_minutes', 'price', 'link']
+
+CREATE_STAGING = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS recipe_import_staging (
+        id bigint,
+        user_id bigint NOT NULL,
+        title text NOT NULL,
+        description text NOT NULL,
+        time_minutes integer NOT NULL,
+        price numeric(5, 2) NOT NULL,
+        link varchar(255) NOT NULL
+    ) ON COMMIT DELETE ROWS
+"""
+
+# An unquoted empty field is NULL in CSV, blank text must stay ''.
+COPY_STAGING = (
+    'COPY recipe_import_staging (%s) FROM STDIN WITH '
+    '(FORMAT csv, FORCE_NOT_NULL (title, description, link))'
+    % ', '.join(COLUMNS)
+)
+
+UPDATE_FROM_STAGING = """
+    UPDATE core_recipe AS r
+    SET title = s.title, description = s.description,
+        time_minutes = s.time_minutes, price = s.price, link = s.link,
+        updated_at = %s
+    FROM recipe_import_staging AS s
+    WHERE s.id IS NOT NULL AND r.id = s.id AND r.user_id = s.user_id
+"""
+
+INSERT_FROM_STAGING = """
+    INSERT INTO core_recipe (user_id, title, description, time_minutes, price,
+                             link, created_at, updated_at)
+    SELECT user_id, title, description, time_minutes, price, link, %s, %s
+    FROM recipe_import_staging
+    WHERE id IS NULL
+"""
+
+
+def read_rows(path, file_format):
+    """Yield raw rows from a CSV or NDJSON file."""
+    with open(path, newline='', encoding='utf-8') as source:
+        if file_format == 'csv':
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class Command(BaseCommand):
+    """Django command for importing recipes."""
+    help = 'Import recipes for a user from a CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file to import.')
+        parser.add_argument('--user', required=True,
+                            help='Email of the user owning the recipes.')
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help='File format, guessed from the extension.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--checkpoint',
+                            help='File recording progress, to resume from.')
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Always use bulk_create instead of COPY.')
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'ndjson')
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError('User %s does not exist.' % options['user'])
+
+        checkpoint = options['checkpoint']
+        done = self.load_checkpoint(checkpoint, path)
+        if done:
+            self.stdout.write('Resuming after row %d.' % done)
+
+        use_copy = not options['no_copy'] and self.copy_available()
+        load = self.load_with_copy if use_copy else self.load_with_orm
+        validator = RecipeDetailSerializer()
+        totals = {'inserted': 0, 'updated': 0, 'skipped': 0, 'invalid': 0}
+
+        rows = islice(read_rows(path, file_format), done, None)
+        while True:
+            batch = list(islice(rows, options['batch_size']))
+            if not batch:
+                break
+            valid = []
+            for number, raw in enumerate(batch, start=done + 1):
+                try:
+                    valid.append(self.clean_row(validator, raw, user))
+                except ValidationError as exc:
+                    totals['invalid'] += 1
+                    self.stderr.write('Row %d is invalid: %s' % (number, exc.detail))
+
+            with transaction.atomic():
+                inserted, updated = load(valid)
+            totals['inserted'] += inserted
+            totals['updated'] += updated
+            totals['skipped'] += len(valid) - inserted - updated
+
+            done += len(batch)
+            self.save_checkpoint(checkpoint, path, done)
+            self.stdout.write(
+                'Processed %d rows (%s)' % (done, ', '.join(
+                    '%s %d' % item for item in totals.items())))
+
+        touch_recipes(user.pk)
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS('Import complete!'))
+
+    def clean_row(self, validator, raw, user):
+        """Validate a raw row like the API would and return its values."""
+        if not isinstance(raw, dict):
+            raise ValidationError('Expected an object.')
+        attrs = validator.run_validation(raw)
+        pk = raw.get('id')
+        if pk in (None, ''):
+            pk = None
+        else:
+            try:
+                pk = int(pk)
+            except (TypeError, ValueError):
+                raise ValidationError({'id': ['A valid integer is required.']})
+        return {
+            'id': pk,
+            'user_id': user.pk,
+            'title': attrs['title'],
+            'description': attrs.get('description', ''),
+            'time_minutes': attrs['time_minutes'],
+            'price': attrs['price'],
+            'link': attrs.get('link', ''),
+        }
+
+    def copy_available(self):
+        """Return whether the database connection supports COPY."""
+        if connection.vendor != 'postgresql':
+            return False
+        with connection.cursor() as cursor:
+            return hasattr(cursor.cursor, 'copy_expert')
+
+    def load_with_copy(self, rows):
+        """Load rows through a staging table filled with COPY."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['' if row[c] is None else row[c] for c in COLUMNS])
+        buffer.seek(0)
+
+        now = timezone.now()
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_STAGING)
+            cursor.cursor.copy_expert(COPY_STAGING, buffer)
+            cursor.execute(UPDATE_FROM_STAGING, [now])
+            updated = cursor.rowcount
+            cursor.execute(INSERT_FROM_STAGING, [now, now])
+            inserted = cursor.rowcount
+        return inserted, updated
+
+    def load_with_orm(self, rows):
+        """Load rows with bulk_create and bulk_update."""
+        new = [Recipe(**row) for row in rows if row['id'] is None]
+        changes = {row['id']: row for row in rows if row['id'] is not None}
+        existing = Recipe.objects.filter(
+            user_id__in={row['user_id'] for row in changes.values()},
+        ).in_bulk(list(changes))
+
+        now = timezone.now()
+        updated = []
+        for pk, recipe in existing.items():
+            row = changes[pk]
+            for field in COLUMNS[2:]:
+                setattr(recipe, field, row[field])
+            recipe.updated_at = now
+            updated.append(recipe)
+
+        Recipe.objects.bulk_create(new)
+        Recipe.objects.bulk_update(updated, COLUMNS[2:] + ['updated_at'])
+        return len(new), len(updated)
+
+    def load_checkpoint(self, checkpoint, path):
+        """Return how many rows of path a previous run already imported."""
+        if not checkpoint or not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint) as source:
+            state = json.load(source)
+        if state.get('path') != os.path.abspath(path):
+            raise CommandError('Checkpoint %s belongs to %s.'
+                               % (checkpoint, state.get('path')))
+        return state['rows']
+
+    def save_checkpoint(self, checkpoint, path, rows):
+        """Atomically record how many rows of path were imported."""
+        if not checkpoint:
+            return
+        tmp = checkpoint + '.tmp'
+        with open(tmp, 'w') as target:
+            json.dump({'path': os.path.abspath(path), 'rows': rows}, target)
+        os.replace(tmp, checkpoint)
@@ -0,0 +1,37 @@
+"""
+Django command to delete recipe tombstones no sync token can still reach.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import RecipeTombstone
+
+
+class Command(BaseCommand):
+    """Django command for pruning recipe tombstones."""
+    help = ('Delete tombstones older than RECIPE_TOMBSTONE_RETENTION_DAYS, '
+            'whose sync tokens are answered with 410 anyway.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Tombstones deleted per statement.')
+
+    def handle(self, *args, **options):
+        """Entry point for command"""
+        # Tokens just inside the retention are re-sent the sync overlap too.
+        cutoff = timezone.now() - datetime.timedelta(
+            days=settings.RECIPE_TOMBSTONE_RETENTION_DAYS,
+            seconds=settings.RECIPE_SYNC_OVERLAP_SECONDS)
+        expired = RecipeTombstone.objects.filter(deleted_at__lt=cutoff)
+        total = 0
+        while True:
+            batch = expired.values_list('pk', flat=True)[:options['batch_size']]
+            deleted, _by_model = RecipeTombstone.objects.filter(
+                pk__in=list(batch)).delete()
+            total += deleted
+            if deleted < options['batch_size']:
+                break
+        self.stdout.write(self.style.SUCCESS('Pruned %d tombstones.' % total))
@@ -1,24 +1,81 @@
 """
 Django command to wait for the DATABASE to be available for connection.
 """
-from django.core.management.base import BaseCommand
-from psycopg2 import OperationalError as Psycopg2Error
-from django.db.utils import OperationalError
+import random
 import time
 
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import OperationalError
+from psycopg2 import OperationalError as Psycopg2Error
+
+from core.db import readiness
+
 
 class Command(BaseCommand):
     """Django command for wait for database."""
+    help = ('Wait until every database accepts connections, retrying with '
+            'jittered exponential backoff, and fail after --timeout seconds.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help='Database alias to wait for, may be repeated (default: all).')
+        parser.add_argument(
+            '--probe', choices=('check',) + readiness.PROBES, default='check',
+            help="'check' runs Django's database system checks, 'select' only "
+                 "runs SELECT 1 and 'tcp' only opens a socket.")
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to wait before giving up, 0 waits forever.')
+        parser.add_argument('--initial-delay', type=float, default=0.05)
+        parser.add_argument('--max-delay', type=float, default=2)
+
+    def check_database(self, alias, mode, timeout=None):
+        """Return None if the database is ready, else the error message."""
+        if mode != 'check':
+            return readiness.probe(alias, mode, timeout)
+        try:
+            self.check(databases=[alias])  # type: ignore
+        except (Psycopg2Error, OperationalError) as exc:
+            return str(exc) or exc.__class__.__name__
+        finally:
+            # Probes run on worker threads, whose connections are not reused.
+            connections[alias].close()
+        return None
 
     def handle(self, *args, **options):
         """Entry point for command"""
         self.stdout.write('Waiting for database...')
-        db_up = False
-        while db_up is False:
-            try:
-                self.check(databases=['default'])  # type: ignore
-                db_up = True
-            except (Psycopg2Error, OperationalError):
-                self.stdout.write('Database Unavailable, waiting 1 second...')
-                time.sleep(1)
+        pending = options['databases'] or list(settings.DATABASES)
+        unknown = set(pending) - set(settings.DATABASES)
+        if unknown:
+            raise CommandError('Unknown database: %s' % ', '.join(sorted(unknown)))
+        timeout = options['timeout']
+        deadline = time.monotonic() + timeout if timeout else None
+        attempt = 0
+        while True:
+            # A probe that hangs is abandoned at the deadline.
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            errors = readiness.probe_all(
+                pending, self.check_database, timeout=remaining,
+                mode=options['probe'])
+            pending = [alias for alias, error in errors.items() if error]
+            if not pending:
+                break
+
+            delay = min(options['max_delay'], options['initial_delay'] * 2 ** attempt)
+            # Jitter keeps many containers from retrying in lockstep.
+            delay = random.uniform(delay / 2, delay)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError('Database unavailable after %gs: %s' % (
+                        timeout, ', '.join(pending)))
+                delay = min(delay, remaining)
+            self.stdout.write('Database unavailable (%s), waiting %.2f seconds...' % (
+                ', '.join(pending), delay))
+            time.sleep(delay)
+            attempt += 1
         self.stdout.write(self.style.SUCCESS('Database Available!'))
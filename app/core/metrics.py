@@ -0,0 +1,289 @@
+"""
+In-process counters, gauges and histograms, exported for Prometheus.
+
+Each thread adds to its own shard of values without taking a lock, and
+readers add the shards up. With METRICS_MULTIPROC_DIR set, every process
+also writes its totals to a file in that directory each
+METRICS_FLUSH_INTERVAL seconds, and render() adds up the files of all
+processes. Clear the directory when the server starts.
+"""
+import atexit
+import bisect
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+PROCESS_FILE_RE = re.compile(r'metrics-([0-9]+)\.json\Z')
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_lock = threading.Lock()
+_local = threading.local()
+_shards = []
+_retired = defaultdict(int)
+_types = {}
+_buckets = {}
+_collectors = []
+_flusher = None
+
+
+def _shard():
+    """Return the calling thread's values, a dict of (name, labels) keys."""
+    try:
+        return _local.values
+    except AttributeError:
+        values = _local.values = {}
+        with _lock:
+            _shards.append((threading.current_thread(), values))
+        if settings.METRICS_MULTIPROC_DIR:
+            _start_flusher()
+        return values
+
+
+def _add(name, labels, value):
+    values = _shard()
+    key = (name, labels)
+    values[key] = values.get(key, 0) + value
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def increment(name, value=1, **labels):
+    """Add value to the named counter."""
+    _add(name, _labels(labels), value)
+
+
+def gauge_add(name, value, **labels):
+    """Add value, which may be negative, to the named gauge."""
+    _types[name] = 'gauge'
+    _add(name, _labels(labels), value)
+
+
+def observe(name, value, buckets=DEFAULT_BUCKETS, **labels):
+    """Record value in the named histogram."""
+    _types[name] = 'histogram'
+    _buckets[name] = buckets
+    labels = _labels(labels)
+    index = bisect.bisect_left(buckets, value)
+    le = _format(buckets[index]) if index < len(buckets) else '+Inf'
+    _add(name + '_bucket', labels + (('le', le),), 1)
+    _add(name + '_sum', labels, value)
+    _add(name + '_count', labels, 1)
+
+
+def register_collector(collect):
+    """Add a function returning (name, labels, value) gauges read when scraped."""
+    _collectors.append(collect)
+
+
+def _collect():
+    """Return the totals of every thread of this process."""
+    totals = defaultdict(int)
+    with _lock:
+        running = []
+        for thread, values in _shards:
+            # dict.copy() is atomic, so writers never wait for readers.
+            copied = values.copy()
+            if thread.is_alive():
+                running.append((thread, values))
+                target = totals
+            else:
+                target = _retired
+            for key, value in copied.items():
+                target[key] += value
+        _shards[:] = running
+        for key, value in _retired.items():
+            totals[key] += value
+    return totals
+
+
+def get(name, **labels):
+    """Return the named counter, summed over series with matching labels."""
+    wanted = set(_labels(labels))
+    return sum(
+        value for (key, series), value in _collect().items()
+        if key == name and wanted.issubset(series))
+
+
+def snapshot(prefix=''):
+    """Return {series: value} for the series whose name starts with prefix."""
+    return {
+        _series(name, labels): value
+        for (name, labels), value in _collect().items()
+        if name.startswith(prefix)
+    }
+
+
+def reset():
+    """Reset every metric to zero."""
+    with _lock:
+        for _thread, values in _shards:
+            values.clear()
+        _retired.clear()
+
+
+def samples():
+    """Return this process's {(name, labels): value}, with collected gauges."""
+    totals = _collect()
+    for collect in _collectors:
+        for name, labels, value in collect():
+            _types[name] = 'gauge'
+            totals[(name, _labels(labels))] += value
+    return totals
+
+
+def _process_file(pid):
+    return os.path.join(settings.METRICS_MULTIPROC_DIR, 'metrics-%d.json' % pid)
+
+
+def write_process_file():
+    """Write this process's totals for the other processes to read."""
+    path = _process_file(os.getpid())
+    data = {
+        'samples': [[name, labels, value]
+                    for (name, labels), value in samples().items()],
+        'types': dict(_types),
+        'buckets': dict(_buckets),
+    }
+    # The flusher and a scrape may write at once, each to its own file.
+    temporary = '%s.%d.tmp' % (path, threading.get_ident())
+    with open(temporary, 'w') as target:
+        json.dump(data, target)
+    os.replace(temporary, path)
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _flush_forever():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        try:
+            write_process_file()
+        except OSError:
+            pass
+
+
+def _start_flusher():
+    global _flusher
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_flush_forever, name='metrics-flush', daemon=True)
+            _flusher.start()
+            atexit.register(write_process_file)
+
+
+def _after_fork():
+    """Start the child from zero, the parent reports what it counted."""
+    global _flusher, _lock
+    _lock = threading.Lock()
+    _shards.clear()
+    _retired.clear()
+    _flusher = None
+    if hasattr(_local, 'values'):
+        del _local.values
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def aggregate():
+    """Return the samples of every process, types and histogram buckets."""
+    if not settings.METRICS_MULTIPROC_DIR:
+        return samples(), dict(_types), dict(_buckets)
+
+    write_process_file()
+    totals = defaultdict(int)
+    types, buckets = dict(_types), dict(_buckets)
+    directory = settings.METRICS_MULTIPROC_DIR
+    for filename in os.listdir(directory):
+        match = PROCESS_FILE_RE.match(filename)
+        if match is None:
+            continue
+        pid = int(match.group(1))
+        try:
+            with open(os.path.join(directory, filename)) as source:
+                data = json.load(source)
+        except (OSError, ValueError):
+            continue
+        types.update(data['types'])
+        buckets.update(data['buckets'])
+        # Gauges of exited processes are stale, their counters still count.
+        running = _is_running(pid)
+        for name, labels, value in data['samples']:
+            if running or types.get(name) != 'gauge':
+                totals[(name, tuple(map(tuple, labels)))] += value
+    return totals, types, buckets
+
+
+def _format(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _series(name, labels):
+    if not labels:
+        return name
+    escaped = (
+        (key, value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for key, value in labels)
+    return '%s{%s}' % (name, ','.join('%s="%s"' % item for item in escaped))
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format."""
+    totals, types, buckets = aggregate()
+    families = defaultdict(dict)
+    for (name, labels), value in totals.items():
+        family = name
+        for suffix in ('_bucket', '_sum', '_count'):
+            base = name[:-len(suffix)]
+            if name.endswith(suffix) and types.get(base) == 'histogram':
+                family = base
+        families[family][(name, labels)] = value
+
+    lines = []
+    for family in sorted(families):
+        kind = types.get(family, 'counter')
+        lines.append('# TYPE %s %s' % (family, kind))
+        series = families[family]
+        if kind == 'histogram':
+            lines.extend(_render_histogram(family, series, buckets[family]))
+            continue
+        for (name, labels), value in sorted(series.items()):
+            lines.append('%s %s' % (_series(name, labels), _format(value)))
+    return '\n'.join(lines) + '\n'
+
+
+def _render_histogram(family, series, bounds):
+    """Return the cumulative bucket, sum and count lines of a histogram."""
+    label_sets = sorted({
+        labels for (name, labels) in series if name == family + '_count'})
+    for labels in label_sets:
+        cumulative = 0
+        for le in [_format(bound) for bound in bounds] + ['+Inf']:
+            cumulative += series.get((family + '_bucket', labels + (('le', le),)), 0)
+            yield '%s %s' % (
+                _series(family + '_bucket', labels + (('le', le),)), cumulative)
+        yield '%s %s' % (
+            _series(family + '_sum', labels), _format(series[(family + '_sum', labels)]))
+        yield '%s %s' % (_series(family + '_count', labels), cumulative)
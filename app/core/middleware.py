@@ -0,0 +1,273 @@
+"""
+Middleware for the API.
+"""
+import hashlib
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+from core import compression, metrics
+from core.db.instrumentation import QueryBudgetExceeded, record_queries
+from core.db.routers import replica_reads
+
+query_logger = logging.getLogger('core.queries')
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+METHODS = {'GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress responses with the best coding the client accepts.
+
+    Like django.middleware.gzip.GZipMiddleware, but negotiating gzip, br and
+    zstd by q-value, skipping small or incompressible responses, and
+    compressing streaming responses chunk by chunk as they are sent.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        codings = compression.available_codings()
+        self.preference = [
+            coding for coding in settings.COMPRESSION_ENCODINGS
+            if coding in codings
+        ]
+        self.compressors = codings
+        self.levels = settings.COMPRESSION_LEVELS
+
+    def is_compressible_type(self, content_type):
+        """Return whether responses of the content type are compressed."""
+        content_type = content_type.split(';')[0].strip()
+        return content_type.startswith('text/') or (
+            content_type in settings.COMPRESSION_CONTENT_TYPES)
+
+    def is_compressible(self, response):
+        """Return whether the response is worth compressing."""
+        if response.has_header('Content-Encoding'):
+            return False
+        if not response.streaming and (
+                len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return False
+        return self.is_compressible_type(response.get('Content-Type', ''))
+
+    def weaken_etag(self, response):
+        """Mark a strong ETag weak, as it names the uncompressed body."""
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+
+    def process_not_modified(self, request, response):
+        """Give a 304 the Vary and ETag headers the full response would have.
+
+        A 304 usually carries no Content-Type, in which case it is taken to
+        stand for a compressible response.
+        """
+        content_type = response.get('Content-Type')
+        if content_type is not None and not self.is_compressible_type(content_type):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if compression.negotiate(
+                request.META.get('HTTP_ACCEPT_ENCODING', ''), self.preference):
+            self.weaken_etag(response)
+        return response
+
+    def process_response(self, request, response):
+        """Compress the response body if negotiated."""
+        if response.status_code == 304:
+            return self.process_not_modified(request, response)
+        if not self.is_compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        coding = compression.negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), self.preference)
+        if coding is None:
+            return response
+        compressor = self.compressors[coding](self.levels[coding])
+
+        if response.streaming:
+            compress = (compression.acompress_sequence if response.is_async
+                        else compression.compress_sequence)
+            response.streaming_content = compress(
+                compressor, response.streaming_content,
+                settings.COMPRESSION_STREAM_FLUSH_SIZE)
+            # The compressed size is unknown until the stream ends.
+            del response.headers['Content-Length']
+        else:
+            content = compressor.compress(response.content) + compressor.finish()
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+
+        # The compressed body is a different representation, so a strong
+        # ETag must become weak; conditional requests compare weakly anyway.
+        self.weaken_etag(response)
+        response.headers['Content-Encoding'] = coding
+        return response
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """Let safe requests read from replicas, except right after a write.
+
+    A client that sent a write reads from the primary for the next
+    DB_REPLICA_STICKY_SECONDS, so it sees its own changes. Clients are told
+    apart by their Authorization header only: behind a proxy every client
+    shares an address. Views issuing credentials pin them with
+    pin_authorization(), which covers the first request after logging in.
+    """
+
+    def get_client_keys(self, request, authorizations=()):
+        """Return the cache keys marking the client as recently written."""
+        idents = list(authorizations)
+        if request.META.get('HTTP_AUTHORIZATION'):
+            idents.append(request.META['HTTP_AUTHORIZATION'])
+        return [
+            'db:sticky:%s' % hashlib.sha256(ident.encode()).hexdigest()
+            for ident in idents
+        ]
+
+    def process_request(self, request):
+        """Allow replica reads for safe requests of clients not pinned."""
+        cache = caches[settings.DB_REPLICA_STICKY_CACHE_ALIAS]
+        replica_reads.set(
+            bool(settings.DB_REPLICAS)
+            and request.method in SAFE_METHODS
+            and not cache.get_many(self.get_client_keys(request)))
+
+    def process_response(self, request, response):
+        """Pin the client to the primary after a write."""
+        replica_reads.set(False)
+        if settings.DB_REPLICAS and request.method not in SAFE_METHODS:
+            keys = self.get_client_keys(
+                request, getattr(request, 'pinned_authorizations', ()))
+            cache = caches[settings.DB_REPLICA_STICKY_CACHE_ALIAS]
+            cache.set_many(
+                dict.fromkeys(keys, True), settings.DB_REPLICA_STICKY_SECONDS)
+        return response
+
+
+class QueryInstrumentationMiddleware(MiddlewareMixin):
+    """Count the queries and SQL time of every request.
+
+    The totals are sent in a Server-Timing header and logged for a sample
+    of QUERY_LOG_SAMPLE_RATE requests. A request running more queries than
+    its view's budget is always logged, or raises QueryBudgetExceeded when
+    QUERY_BUDGET_MODE is 'raise'. Budgets come from QUERY_BUDGETS by URL
+    name, else from a `query_budget` attribute on the view class.
+    """
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with record_queries() as stats:
+            response = self.get_response(request)
+        return self.process_stats(request, response, stats, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with record_queries() as stats:
+            response = await self.get_response(request)
+        return self.process_stats(request, response, stats, started)
+
+    def get_budget(self, request):
+        """Return the query budget of the resolved view, or None."""
+        match = request.resolver_match
+        if match is None:
+            return None
+        if match.view_name in settings.QUERY_BUDGETS:
+            return settings.QUERY_BUDGETS[match.view_name]
+        view_class = getattr(match.func, 'cls', None)
+        return getattr(view_class, 'query_budget', None)
+
+    def process_stats(self, request, response, stats, started):
+        """Report the queries of a finished request."""
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        view_name = match.view_name if match is not None else None
+        label = view_name or 'unresolved'
+        metrics.increment('db_queries_total', stats.count, view=label)
+        metrics.increment('db_query_seconds_total', stats.duration, view=label)
+        metrics.observe('http_request_db_queries', stats.count,
+                        buckets=QUERY_COUNT_BUCKETS, view=label)
+        if settings.QUERY_SERVER_TIMING:
+            timing = 'db;dur=%.1f;desc="%d queries, %d duplicates", app;dur=%.1f' % (
+                stats.duration * 1000, stats.count, stats.duplicates, elapsed * 1000)
+            if response.has_header('Server-Timing'):
+                timing = '%s, %s' % (response['Server-Timing'], timing)
+            response['Server-Timing'] = timing
+
+        budget = self.get_budget(request)
+        over_budget = budget is not None and stats.count > budget
+        if over_budget or random.random() < settings.QUERY_LOG_SAMPLE_RATE:
+            fields = {
+                'method': request.method,
+                'path': request.path,
+                'view': view_name,
+                'status': response.status_code,
+                'queries': stats.count,
+                'duplicates': stats.duplicates,
+                'sql_ms': round(stats.duration * 1000, 1),
+                'total_ms': round(elapsed * 1000, 1),
+                'budget': budget,
+            }
+            message = ' '.join('%s=%s' % item for item in fields.items())
+            level = logging.WARNING if over_budget else logging.INFO
+            query_logger.log(level, message, extra={'queries': fields})
+
+        if over_budget:
+            metrics.increment('db_query_budget_exceeded_total')
+            if settings.QUERY_BUDGET_MODE == 'raise':
+                repeated = ''.join(
+                    '\n%dx %s' % (n, sql) for sql, n in stats.repeated())
+                raise QueryBudgetExceeded('%s ran %d queries, over its budget of %d%s' % (
+                    view_name, stats.count, budget, repeated))
+        return response
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """Record the latency and status of requests and how many are running.
+
+    Requests are labelled by URL name, which keeps the number of series
+    bounded whatever paths clients send.
+    """
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        metrics.gauge_add('http_requests_in_flight', 1)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.gauge_add('http_requests_in_flight', -1)
+        self.record(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        metrics.gauge_add('http_requests_in_flight', 1)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.gauge_add('http_requests_in_flight', -1)
+        self.record(request, response, started)
+        return response
+
+    def record(self, request, response, started):
+        """Count the response and observe its latency."""
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        method = request.method if request.method in METHODS else 'other'
+        metrics.observe('http_request_duration_seconds',
+                        time.perf_counter() - started, view=view, method=method)
+        metrics.increment('http_responses_total', view=view, method=method,
+                          status=response.status_code)
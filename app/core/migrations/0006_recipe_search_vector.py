@@ -0,0 +1,94 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:30
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+BACKFILL_BATCH_SIZE = 10000
+
+SEARCH_VECTOR = """
+    setweight(to_tsvector('pg_catalog.english', coalesce({row}.title, '')), 'A') ||
+    setweight(to_tsvector('pg_catalog.english', coalesce({row}.description, '')), 'B')
+"""
+
+CREATE_TRIGGER = """
+CREATE OR REPLACE FUNCTION core_recipe_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {vector};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_search_vector_trigger
+BEFORE INSERT OR UPDATE OF title, description ON core_recipe
+FOR EACH ROW EXECUTE FUNCTION core_recipe_search_vector_update();
+""".format(vector=SEARCH_VECTOR.format(row='NEW'))
+
+DROP_TRIGGER = """
+DROP TRIGGER IF EXISTS core_recipe_search_vector_trigger ON core_recipe;
+DROP FUNCTION IF EXISTS core_recipe_search_vector_update();
+"""
+
+BACKFILL = """
+UPDATE core_recipe SET search_vector = {vector}
+WHERE id > %s AND id <= %s
+""".format(vector=SEARCH_VECTOR.format(row='core_recipe'))
+
+
+def create_search_trigger(apps, schema_editor):
+    """Keep search_vector in sync with title and description."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_TRIGGER)
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(DROP_TRIGGER)
+
+
+def backfill_search_vector(apps, schema_editor):
+    """Fill search_vector of existing rows, one committed batch at a time."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT coalesce(max(id), 0) FROM core_recipe')
+        last_id = cursor.fetchone()[0]
+        for start in range(0, last_id, BACKFILL_BATCH_SIZE):
+            cursor.execute(BACKFILL, [start, start + BACKFILL_BATCH_SIZE])
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipe_search_vector_gin '
+        'ON core_recipe USING gin (search_vector)')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    # Lets every backfill batch commit on its own instead of holding one
+    # long transaction and row locks over the whole table.
+    atomic = False
+
+    dependencies = [
+        ('core', '0005_recipe_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:35
+
+from django.db import migrations
+
+
+def create_trigram_index(apps, schema_editor):
+    """Index titles for fuzzy autocomplete with pg_trgm."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipe_title_trgm_gin '
+        'ON core_recipe USING gin (title gin_trgm_ops)')
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_title_trgm_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
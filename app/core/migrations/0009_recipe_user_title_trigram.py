@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-17 09:10
+
+from django.db import migrations
+
+
+def create_user_trigram_index(apps, schema_editor):
+    """Lead the title trigram index with user_id, using btree_gin."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipe_user_title_trgm_gin '
+        'ON core_recipe USING gin (user_id, title gin_trgm_ops)')
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_title_trgm_gin')
+
+
+def drop_user_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipe_title_trgm_gin '
+        'ON core_recipe USING gin (title gin_trgm_ops)')
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_user_title_trgm_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_range_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_user_trigram_index, drop_user_trigram_index),
+    ]
@@ -2,13 +2,17 @@
 Database models.
 """
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin
 )
 
+from core import hashing
+
 
 class UserManager(BaseUserManager):
     """Manager for Users."""
@@ -40,11 +44,24 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    recipes_modified_at = models.DateTimeField(default=timezone.now)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+    def set_password(self, raw_password):
+        """Hash the password on the hashing pool."""
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """Verify the password on the hashing pool, upgrading old hashes."""
+        def update(encoded):
+            self.password = encoded
+            self.save(update_fields=['password'])
+        return hashing.check_password(raw_password, self.password, update)
+
 
 class Recipe(models.Model):
     """Recipe model."""
@@ -57,6 +74,37 @@ class Recipe(models.Model):
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by a database trigger on PostgreSQL, see migration 0006.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_id_desc_idx'),
+            models.Index(fields=['user', 'updated_at'],
+                         name='recipe_user_updated_idx'),
+            models.Index(fields=['user', 'price', 'id'],
+                         name='recipe_user_price_idx'),
+            models.Index(fields=['user', 'time_minutes', 'id'],
+                         name='recipe_user_time_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.title
+
+
+class RecipeTombstone(models.Model):
+    """Record of a deleted recipe, kept for incremental sync."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    recipe_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'],
+                         name='tombstone_user_deleted_idx'),
+        ]
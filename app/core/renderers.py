@@ -0,0 +1,48 @@
+"""
+Renderers for the API.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer encoding with orjson when it is installed.
+
+    Anything orjson does not encode the way DRF's JSONEncoder does (dates,
+    Decimal, lazy strings, ...) is handed to that encoder, and indented,
+    ASCII-only or non-compact output falls back to the stdlib renderer.
+    The output is the same JSON, but not always the same bytes: floats
+    with an exponent are spelled differently (1e-7 for 1e-07, 0.00001 for
+    1e-05, 1e16 for 1e+16), and NaN and infinity render as null where
+    JSONRenderer raises.
+    """
+
+    def __init__(self):
+        self.default = self.encoder_class().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render `data` into JSON, returning a bytestring."""
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits, let the stdlib deal with them
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same strict javascript subset escaping as JSONRenderer.
+        return ret.replace(
+            '\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
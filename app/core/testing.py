@@ -0,0 +1,29 @@
+"""
+Test helpers for the API.
+"""
+import contextlib
+
+from core.db.instrumentation import record_queries
+
+
+class QueryBudgetMixin:
+    """TestCase mixin asserting how many queries a block runs."""
+
+    @contextlib.contextmanager
+    def assertMaxQueries(self, budget, max_duplicates=None):
+        """Fail if the block runs more than `budget` queries on any database.
+
+        Unlike assertNumQueries, any count up to the budget passes, and
+        `max_duplicates` limits statements repeated with other parameters,
+        as N+1 lookups are.
+        """
+        with record_queries() as stats:
+            yield stats
+        statements = '\n'.join(
+            '%dx %s' % (n, sql) for sql, n in stats.statements.most_common())
+        if stats.count > budget:
+            self.fail('%d queries run, over the budget of %d:\n%s' % (
+                stats.count, budget, statements))
+        if max_duplicates is not None and stats.duplicates > max_duplicates:
+            self.fail('%d duplicate queries run, over the limit of %d:\n%s' % (
+                stats.duplicates, max_duplicates, statements))
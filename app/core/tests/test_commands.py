@@ -1,13 +1,32 @@
 """
 Test custom django management commands
 """
+import datetime
+import json
+import os
+import tempfile
+import threading
+import unittest
+from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.utils import timezone
+
+from core.models import Recipe, RecipeTombstone
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -32,3 +51,249 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+    @patch('time.sleep')
+    def test_wait_for_db_backoff(self, patched_sleep, patched_check):
+        """Test the delay doubles from the initial delay up to the maximum."""
+        patched_check.side_effect = [OperationalError] * 6 + [True]
+
+        call_command('wait_for_db', initial_delay=0.1, max_delay=1,
+                     stdout=StringIO())
+
+        delays = [call.args[0] for call in patched_sleep.call_args_list]
+        for delay, limit in zip(delays, [0.1, 0.2, 0.4, 0.8, 1, 1]):
+            self.assertGreaterEqual(delay, limit / 2)
+            self.assertLessEqual(delay, limit)
+
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_check):
+        """Test the command fails once the deadline has passed."""
+        patched_check.side_effect = OperationalError
+        with patch('time.monotonic', side_effect=[0, 0, 0.5, 0.5, 2]):
+            with self.assertRaisesMessage(CommandError, 'unavailable after 1s'):
+                call_command('wait_for_db', timeout=1, stdout=StringIO())
+
+        patched_sleep.assert_called_once()
+
+    def test_wait_for_db_unknown_alias(self, patched_check):
+        """Test asking for a database that is not configured fails."""
+        with self.assertRaisesMessage(CommandError, 'Unknown database: other'):
+            call_command('wait_for_db', databases=['default', 'other'],
+                         stdout=StringIO())
+
+        patched_check.assert_not_called()
+
+    @patch('core.db.readiness.probe_tcp')
+    def test_wait_for_db_tcp_probe(self, patched_probe, patched_check):
+        """Test the tcp probe skips Django's system checks."""
+        call_command('wait_for_db', probe='tcp', stdout=StringIO())
+
+        patched_check.assert_not_called()
+        alias, timeout = patched_probe.call_args.args
+        self.assertEqual(alias, 'default')
+        self.assertLessEqual(timeout, 60)
+
+    def test_wait_for_db_hung_probe(self, patched_check):
+        """Test a probe that never returns is abandoned at the deadline."""
+        release = threading.Event()
+        self.addCleanup(release.set)
+        patched_check.side_effect = lambda **kwargs: release.wait()
+
+        with self.assertRaisesMessage(CommandError, 'unavailable after 0.2s'):
+            call_command('wait_for_db', timeout=0.2, stdout=StringIO())
+
+
+class ImportRecipesCommandTests(TestCase):
+    """Tests for the import_recipes command."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(  # type: ignore
+            email='import@example.com', password='importpass#123')
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write_file(self, name, content):
+        """Write a file to the temporary directory and return its path."""
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w') as target:
+            target.write(content)
+        return path
+
+    def test_import_csv(self):
+        """Test importing recipes from a CSV file."""
+        path = self.write_file('recipes.csv', (
+            'title,time_minutes,price,description,link\n'
+            'Soup,10,2.50,Hot soup,\n'
+            'Salad,5,3.00,,http://example.com\n'
+        ))
+
+        call_command('import_recipes', path, user=self.user.email,
+                     stdout=StringIO())
+
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual([r.title for r in recipes], ['Soup', 'Salad'])
+        self.assertEqual(recipes[0].price, Decimal('2.50'))
+        self.assertEqual(recipes[1].link, 'http://example.com')
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'COPY needs PostgreSQL')
+    def test_import_copy_keeps_blank_fields(self):
+        """Test blank text fields loaded with COPY are stored as ''."""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Old', time_minutes=1, price=Decimal('1.00'),
+            description='Old description', link='http://example.com')
+        path = self.write_file('recipes.ndjson', '\n'.join([
+            json.dumps({'id': recipe.id, 'title': 'Updated',  # type: ignore
+                        'time_minutes': 2, 'price': '2.00',
+                        'description': '', 'link': ''}),
+            json.dumps({'title': 'Added', 'time_minutes': 3, 'price': '3.00'}),
+        ]))
+
+        call_command('import_recipes', path, user=self.user.email,
+                     stdout=StringIO())
+
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.description, recipe.link), ('', ''))
+        added = Recipe.objects.get(title='Added')
+        self.assertEqual((added.description, added.link), ('', ''))
+
+    def test_import_ndjson_updates_and_skips_invalid(self):
+        """Test NDJSON rows update by id and invalid rows are skipped."""
+        recipe = Recipe.objects.create(
+            user=self.user, title='Old', time_minutes=1, price=Decimal('1.00'))
+        path = self.write_file('recipes.ndjson', '\n'.join([
+            json.dumps({'id': recipe.id, 'title': 'New',  # type: ignore
+                        'time_minutes': 2, 'price': '2.00'}),
+            json.dumps({'title': 'No time', 'price': '2.00'}),
+            json.dumps({'title': 'Added', 'time_minutes': 3, 'price': '3.00'}),
+        ]))
+        stderr = StringIO()
+
+        call_command('import_recipes', path, user=self.user.email,
+                     batch_size=2, stdout=StringIO(), stderr=stderr)
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'New')
+        self.assertEqual(recipe.time_minutes, 2)
+        self.assertTrue(Recipe.objects.filter(title='Added').exists())
+        self.assertFalse(Recipe.objects.filter(title='No time').exists())
+        self.assertIn('Row 2 is invalid', stderr.getvalue())
+
+    def test_import_resumes_from_checkpoint(self):
+        """Test rows recorded in the checkpoint are not imported again."""
+        path = self.write_file('recipes.csv', (
+            'title,time_minutes,price\n'
+            'First,1,1.00\n'
+            'Second,2,2.00\n'
+        ))
+        checkpoint = os.path.join(self.tmpdir.name, 'import.checkpoint')
+        with open(checkpoint, 'w') as target:
+            json.dump({'path': os.path.abspath(path), 'rows': 1}, target)
+
+        call_command('import_recipes', path, user=self.user.email,
+                     checkpoint=checkpoint, stdout=StringIO())
+
+        titles = list(Recipe.objects.values_list('title', flat=True))
+        self.assertEqual(titles, ['Second'])
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_import_unknown_user(self):
+        """Test importing for an unknown user fails."""
+        path = self.write_file('recipes.csv', 'title,time_minutes,price\n')
+
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', path, user='nobody@example.com')
+
+
+class PruneTombstonesCommandTests(TestCase):
+    """Tests for the prune_tombstones command."""
+
+    @override_settings(RECIPE_TOMBSTONE_RETENTION_DAYS=30)
+    def test_prunes_expired_tombstones(self):
+        """Test only tombstones older than the retention are deleted."""
+        user = get_user_model().objects.create_user(  # type: ignore
+            email='prune@example.com', password='prunepass#123')
+        now = timezone.now()
+        for days, recipe_id in ((31, 1), (40, 2), (29, 3)):
+            RecipeTombstone.objects.create(
+                user=user, recipe_id=recipe_id,
+                deleted_at=now - datetime.timedelta(days=days))
+        out = StringIO()
+
+        call_command('prune_tombstones', batch_size=1, stdout=out)
+
+        self.assertEqual(
+            list(RecipeTombstone.objects.values_list('recipe_id', flat=True)), [3])
+        self.assertIn('Pruned 2 tombstones.', out.getvalue())
+
+
+class SeedDataAndBenchmarkCommandTests(TestCase):
+    """Tests for the seed_data and benchmark commands."""
+
+    def seed(self, **options):
+        call_command('seed_data', users=3, recipes=20, stdout=StringIO(),
+                     **options)
+        return list(Recipe.objects.order_by('id').values_list(
+            'user__email', 'title', 'time_minutes', 'price'))
+
+    def test_seed_data_is_deterministic(self):
+        """Test seeding twice with the same seed yields the same data."""
+        first = self.seed(seed=7)
+        second = self.seed(seed=7, reset=True)
+
+        self.assertEqual(len(first), 20)
+        self.assertEqual(first, second)
+        self.assertEqual(get_user_model().objects.count(), 3)
+
+    def test_seed_data_rejects_invalid_counts(self):
+        """Test seeding with no users or negative sizes fails cleanly."""
+        cases = [
+            ({'users': 0, 'recipes': 10}, '--users must be at least 1.'),
+            ({'users': 1, 'recipes': -1}, '--recipes must not be negative.'),
+            ({'users': 1, 'batch_size': 0}, '--batch-size must be at least 1.'),
+        ]
+        for options, message in cases:
+            with self.subTest(options=options):
+                with self.assertRaisesMessage(CommandError, message):
+                    call_command('seed_data', stdout=StringIO(), **options)
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_seed_data_refuses_to_duplicate(self):
+        """Test seeding again without --reset fails."""
+        self.seed()
+
+        with self.assertRaises(CommandError):
+            self.seed()
+
+    def test_benchmark_reports_json(self):
+        """Test the benchmark command reports latency and query stats."""
+        self.seed()
+        out = StringIO()
+
+        call_command('benchmark', 'recipe-list', 'user-me', iterations=3,
+                     warmup=1, stdout=out, stderr=StringIO())
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['scenarios']), {'recipe-list', 'user-me'})
+        for stats in report['scenarios'].values():
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'requests_per_second',
+                        'queries_per_request'):
+                self.assertIn(key, stats)
+
+
+@override_settings(ALLOWED_HOSTS=['localhost'])
+class BenchmarkConcurrencyCommandTests(TransactionTestCase):
+    """Tests for the benchmark_concurrency command."""
+
+    def test_reports_both_servers(self):
+        """Test a small burst is reported for WSGI and ASGI."""
+        call_command('seed_data', users=2, recipes=10, stdout=StringIO())
+        out = StringIO()
+
+        call_command('benchmark_concurrency', 'user-me', connections=4,
+                     threads=2, stdout=out, stderr=StringIO())
+
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['servers']), {'wsgi', 'asgi'})
+        for stats in report['servers'].values():
+            self.assertEqual(stats['iterations'], 4)
+            self.assertEqual(stats['errors'], 0)
@@ -0,0 +1,170 @@
+"""
+Tests for the database connection pool.
+"""
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core import metrics
+from core.db.backends.postgresql_pool import base
+from core.db.backends.postgresql_pool.base import reset_connection
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Stand-in for a DB-API connection."""
+
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+
+    def close(self):
+        self.closed = True
+
+
+def reset(connection):
+    return not connection.closed
+
+
+def check(connection):
+    if not connection.alive:
+        raise RuntimeError('server closed the connection')
+    return True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Tests for core.db.pool.ConnectionPool."""
+
+    def setUp(self):
+        metrics.reset()
+        self.opened = []
+
+    def connect(self):
+        connection = FakeConnection()
+        self.opened.append(connection)
+        return connection
+
+    def make_pool(self, **kwargs):
+        options = {'max_size': 2, 'max_idle': 300, 'timeout': 0.05, 'check': check}
+        options.update(kwargs)
+        return ConnectionPool(self.connect, reset, **options)
+
+    def test_released_connections_reused_lifo(self):
+        """Test the most recently released connection is handed out first."""
+        pool = self.make_pool()
+        first, second = pool.acquire(), pool.acquire()
+        pool.release(first)
+        pool.release(second)
+
+        self.assertIs(pool.acquire(), second)
+        self.assertEqual(len(self.opened), 2)
+        self.assertEqual(pool.stats(), {'size': 2, 'idle': 1, 'max_size': 2})
+
+    def test_full_pool_times_out(self):
+        """Test acquiring from an exhausted pool raises after the timeout."""
+        pool = self.make_pool(max_size=1)
+        pool.acquire()
+
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(metrics.get('db_pool_timeouts_total'), 1)
+
+    def test_waiter_gets_released_connection(self):
+        """Test a waiting thread is woken by a release."""
+        pool = self.make_pool(max_size=1, timeout=5)
+        connection = pool.acquire()
+        timer = threading.Timer(0.05, pool.release, args=(connection,))
+        timer.start()
+
+        self.assertIs(pool.acquire(), connection)
+        timer.join()
+        self.assertGreater(metrics.get('db_pool_wait_seconds_total'), 0)
+        self.assertEqual(metrics.get('db_pool_acquired_total'), 2)
+
+    def test_idle_connections_evicted(self):
+        """Test connections idle for longer than max_idle are closed."""
+        pool = self.make_pool(max_idle=0)
+        connection = pool.acquire()
+        pool.release(connection)
+
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(metrics.get('db_pool_connections_evicted_total'), 1)
+
+    def test_broken_connection_not_returned(self):
+        """Test a connection that cannot be reset frees its slot."""
+        pool = self.make_pool(max_size=1)
+        connection = pool.acquire()
+        connection.close()
+        pool.release(connection)
+
+        self.assertEqual(pool.stats()['size'], 0)
+        self.assertIsNot(pool.acquire(), connection)
+
+    def test_dead_idle_connection_reopened(self):
+        """Test an idle connection failing the health check is replaced."""
+        pool = self.make_pool(max_size=1)
+        connection = pool.acquire()
+        pool.release(connection)
+        connection.alive = False
+
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_failed_connect_frees_slot(self):
+        """Test a connect error does not leak a slot."""
+        pool = self.make_pool(max_size=1)
+
+        def refuse():
+            raise OSError('connection refused')
+        with self.assertRaises(OSError):
+            pool.acquire(refuse)
+        self.assertEqual(pool.stats()['size'], 0)
+        pool.acquire()
+
+    def test_close_all(self):
+        """Test idle connections are closed and their slots freed."""
+        pool = self.make_pool()
+        connection = pool.acquire()
+        pool.release(connection)
+        pool.close_all()
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats(), {'size': 0, 'idle': 0, 'max_size': 2})
+
+    def test_stats_exported(self):
+        """Test the pools' sizes are exported as gauges."""
+        pool = self.make_pool()
+        pool.release(pool.acquire())
+        with mock.patch.dict(base._pools, {'default': pool}):
+            text = metrics.render()
+
+        self.assertIn('db_pool_connections{alias="default"} 1\n', text)
+        self.assertIn('db_pool_idle_connections{alias="default"} 1\n', text)
+        self.assertIn('db_pool_max_connections{alias="default"} 2\n', text)
+
+
+class ResetConnectionTests(SimpleTestCase):
+    """Tests for resetting released PostgreSQL connections."""
+
+    def make_connection(self, transaction_status, closed=0):
+        connection = mock.Mock(closed=closed)
+        connection.info.transaction_status = transaction_status
+        return connection
+
+    def test_idle_connection_reused(self):
+        connection = self.make_connection(0)
+        self.assertTrue(reset_connection(connection))
+        connection.rollback.assert_not_called()
+
+    def test_open_transaction_rolled_back(self):
+        connection = self.make_connection(2)
+        self.assertTrue(reset_connection(connection))
+        connection.rollback.assert_called_once()
+
+    def test_lost_connection_discarded(self):
+        self.assertFalse(reset_connection(self.make_connection(4)))
+        self.assertFalse(reset_connection(self.make_connection(0, closed=1)))
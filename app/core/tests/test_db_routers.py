@@ -0,0 +1,177 @@
+"""
+Tests for routing reads to replicas.
+"""
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.checks import check_replica_sticky_cache
+from core.db.routers import (
+    ReplicaRouter,
+    pin_authorization,
+    replica_lag,
+    replica_reads,
+    use_primary,
+)
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import Recipe
+from recipe.tests.test_recipe_api import create_user
+
+
+@override_settings(DB_REPLICAS=['replica1', 'replica2'], DB_REPLICA_MAX_LAG=2)
+class ReplicaRouterTests(SimpleTestCase):
+    """Tests for core.db.routers.ReplicaRouter."""
+
+    def setUp(self):
+        metrics.reset()
+        replica_lag.clear()
+        self.router = ReplicaRouter()
+        self.lags = {'replica1': 0, 'replica2': 0}
+        patcher = mock.patch('core.db.routers.measure_lag', self.lags.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        token = replica_reads.set(True)
+        self.addCleanup(replica_reads.reset, token)
+
+    def read(self, count=1):
+        return [self.router.db_for_read(Recipe) for _ in range(count)]
+
+    def test_reads_round_robin(self):
+        """Test reads alternate between replicas and writes use the primary."""
+        self.assertEqual(self.read(4), ['replica1', 'replica2'] * 2)
+        self.assertEqual(self.router.db_for_write(Recipe), 'default')
+        self.assertEqual(metrics.get('db_replica_reads_total'), 4)
+
+    def test_primary_outside_safe_requests(self):
+        """Test reads use the primary unless replica reads are allowed."""
+        with use_primary():
+            self.assertEqual(self.read(2), ['default', 'default'])
+        self.assertEqual(self.read(), ['replica1'])
+
+    def test_lagging_replica_skipped(self):
+        """Test replicas too far behind are skipped until they catch up."""
+        self.lags['replica1'] = 10
+        self.assertEqual(self.read(2), ['replica2', 'replica2'])
+
+        self.lags['replica2'] = float('inf')
+        replica_lag.clear()
+        self.assertEqual(self.read(), ['default'])
+        self.assertEqual(metrics.get('db_replica_fallback_total'), 1)
+
+    def test_replicas_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+
+
+@override_settings(DB_REPLICAS=['replica1'], DB_REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+    """Tests for choosing replica reads per request."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.allowed = []
+
+        def get_response(request):
+            self.allowed.append(replica_reads.get())
+            return mock.Mock()
+        self.middleware = ReplicaRoutingMiddleware(get_response)
+
+    def test_reads_pinned_after_write(self):
+        """Test a client reads from the primary for a while after writing."""
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+        self.middleware(self.factory.get('/', **auth))
+        self.middleware(self.factory.post('/', **auth))
+        self.middleware(self.factory.get('/', **auth))
+        self.middleware(self.factory.get('/', HTTP_AUTHORIZATION='Token def'))
+
+        self.assertEqual(self.allowed, [True, False, False, True])
+        self.assertFalse(replica_reads.get())
+
+    def test_shared_address_not_pinned(self):
+        """Test a write does not pin other clients behind the same proxy."""
+        self.middleware(self.factory.post('/', REMOTE_ADDR='10.0.0.1'))
+        self.middleware(self.factory.get('/', REMOTE_ADDR='10.0.0.1'))
+        self.middleware(self.factory.get(
+            '/', REMOTE_ADDR='10.0.0.1', HTTP_AUTHORIZATION='Token abc'))
+
+        self.assertEqual(self.allowed, [False, True, True])
+
+    def test_pinned_authorization(self):
+        """Test credentials issued by a write are pinned before first use."""
+        def get_response(request):
+            pin_authorization(request, 'Token issued')
+            return mock.Mock()
+        ReplicaRoutingMiddleware(get_response)(self.factory.post('/'))
+        self.middleware(self.factory.get('/', HTTP_AUTHORIZATION='Token issued'))
+
+        self.assertEqual(self.allowed, [False])
+
+
+class ReplicaRoutingApiTests(TransactionTestCase):
+    """Tests for recipe reads against mirrored replicas.
+
+    Run with DB_REPLICA_HOSTS set so the test runner creates the mirrors.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        if not settings.DB_REPLICAS:
+            self.skipTest('No replicas configured.')
+        cache.clear()
+        replica_lag.clear()
+        patcher = mock.patch('core.db.routers.measure_lag', return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        token = Token.objects.create(user=create_user(email='replica@example.com'))
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+    def test_recipe_reads_use_replica(self):
+        """Test listing recipes reads from a replica unless just written."""
+        replica = connections[settings.DB_REPLICAS[0]]
+        self.client.post(reverse('recipe:recipe-list'), {
+            'title': 'Replica', 'time_minutes': 5, 'price': '1.00'})
+        with CaptureQueriesContext(replica) as sticky:
+            self.client.get(reverse('recipe:recipe-list'))
+
+        cache.clear()
+        with CaptureQueriesContext(replica) as replicated:
+            res = self.client.get(reverse('recipe:recipe-list'))
+
+        self.assertEqual(len(sticky), 0)
+        self.assertGreater(len(replicated), 0)
+        self.assertEqual(res.json()[0]['title'], 'Replica')
+
+
+class StickyCacheCheckTests(SimpleTestCase):
+    """Tests for the shared sticky cache system check."""
+
+    def test_local_cache_rejected_with_replicas(self):
+        """Test a process-local sticky cache is an error once replicas exist."""
+        local = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        shared = {'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://cache:6379'}}
+
+        with override_settings(DB_REPLICAS=[], CACHES=local):
+            self.assertEqual(check_replica_sticky_cache(None), [])
+        with override_settings(DB_REPLICAS=['replica1'], CACHES=shared):
+            self.assertEqual(check_replica_sticky_cache(None), [])
+        with override_settings(DB_REPLICAS=['replica1'], CACHES=local):
+            errors = check_replica_sticky_cache(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
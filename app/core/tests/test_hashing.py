@@ -0,0 +1,91 @@
+"""
+Tests for password hashing on the worker pool.
+"""
+import threading
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import hashing, metrics
+
+TOKEN_URL = reverse('user:token')
+CREATE_USER_URL = reverse('user:create')
+
+
+@override_settings(PASSWORD_HASHER_ITERATIONS=1000)
+class HashingPoolTests(TestCase):
+    """Tests for core.hashing."""
+
+    def setUp(self):
+        metrics.reset()
+        self.client = APIClient()
+
+    def test_hashing_runs_on_pool(self):
+        """Test passwords are hashed and verified off the request thread."""
+        thread = hashing.pool.run(lambda: threading.current_thread().name)
+        encoded = hashing.make_password('pool-pass-123')
+
+        self.assertTrue(thread.startswith('hashing'))
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(hashing.check_password('pool-pass-123', encoded))
+        self.assertFalse(hashing.check_password('wrong-pass-123', encoded))
+        self.assertEqual(metrics.get('password_hashing_total'), 4)
+
+    def test_rehash_on_login(self):
+        """Test logging in upgrades a hash to the configured cost."""
+        user = get_user_model().objects.create_user(  # type: ignore
+            email='rehash@example.com', password='rehash-pass-123')
+        self.assertIn('$1000$', user.password)
+
+        with override_settings(PASSWORD_HASHER_ITERATIONS=2000):
+            res = self.client.post(TOKEN_URL, {
+                'email': 'rehash@example.com', 'password': 'rehash-pass-123'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertIn('$2000$', user.password)
+        self.assertTrue(user.check_password('rehash-pass-123'))
+
+    def test_wrong_password_not_rehashed(self):
+        """Test a failed login leaves the stored hash alone."""
+        user = get_user_model().objects.create_user(  # type: ignore
+            email='norehash@example.com', password='rehash-pass-123')
+        encoded = user.password
+
+        with override_settings(PASSWORD_HASHER_ITERATIONS=2000):
+            self.assertFalse(user.check_password('wrong-pass-123'))
+
+        user.refresh_from_db()
+        self.assertEqual(user.password, encoded)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_MAX_PENDING=0,
+                       PASSWORD_HASHING_QUEUE_TIMEOUT=0)
+    def test_saturated_pool_returns_503(self):
+        """Test sign-ups and logins are refused while the pool is busy."""
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait()
+        busy = threading.Thread(target=hashing.pool.run, args=(block,))
+        busy.start()
+        started.wait()
+        try:
+            login = self.client.post(TOKEN_URL, {
+                'email': 'busy@example.com', 'password': 'busy-pass-123'})
+            signup = self.client.post(CREATE_USER_URL, {
+                'email': 'busy@example.com', 'password': 'busy-pass-123',
+                'name': 'Busy'})
+        finally:
+            release.set()
+            busy.join()
+
+        for res in (login, signup):
+            self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(res['Retry-After'], '1')
+        self.assertEqual(metrics.get('password_hashing_rejected_total'), 2)
+        self.assertFalse(get_user_model().objects.filter(
+            email='busy@example.com').exists())
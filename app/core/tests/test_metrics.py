@@ -0,0 +1,158 @@
+"""
+Tests for metrics and the /metrics endpoint.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import metrics
+
+METRICS_URL = reverse('metrics')
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+class MetricsTests(SimpleTestCase):
+    """Tests for core.metrics."""
+
+    def setUp(self):
+        metrics.reset()
+
+    def test_labelled_counters(self):
+        """Test counters are summed over the series matching the labels."""
+        metrics.increment('requests_total', view='a', status=200)
+        metrics.increment('requests_total', 2, view='a', status=404)
+        metrics.increment('requests_total', view='b', status=200)
+
+        self.assertEqual(metrics.get('requests_total'), 4)
+        self.assertEqual(metrics.get('requests_total', view='a'), 3)
+        self.assertEqual(metrics.get('requests_total', status=200), 2)
+
+    def test_threads_added_up(self):
+        """Test increments from running and finished threads all count."""
+        barrier = threading.Barrier(9)
+
+        def work():
+            for _ in range(1000):
+                metrics.increment('work_total')
+            barrier.wait()
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        self.assertEqual(metrics.get('work_total'), 8000)
+
+        for thread in threads:
+            thread.join()
+        self.assertEqual(metrics.get('work_total'), 8000)
+
+    def test_render(self):
+        """Test the Prometheus text format of each metric type."""
+        metrics.increment('jobs_total', queue='a"b')
+        metrics.gauge_add('jobs_running', 1)
+        for value in (0.1, 0.3, 20):
+            metrics.observe('job_seconds', value, buckets=(0.1, 1), queue='a')
+
+        text = metrics.render()
+
+        self.assertIn('# TYPE jobs_total counter\njobs_total{queue="a\\"b"} 1\n', text)
+        self.assertIn('# TYPE jobs_running gauge\njobs_running 1\n', text)
+        self.assertIn(
+            '# TYPE job_seconds histogram\n'
+            'job_seconds_bucket{queue="a",le="0.1"} 1\n'
+            'job_seconds_bucket{queue="a",le="1"} 2\n'
+            'job_seconds_bucket{queue="a",le="+Inf"} 3\n'
+            'job_seconds_sum{queue="a"} 20.4\n'
+            'job_seconds_count{queue="a"} 3\n', text)
+
+    def test_collectors(self):
+        """Test registered collectors are read as gauges when scraped."""
+        metrics.register_collector(lambda: [('pool_size', {'alias': 'x'}, 3)])
+        self.addCleanup(metrics._collectors.pop)
+
+        self.assertIn('# TYPE pool_size gauge\npool_size{alias="x"} 3\n',
+                      metrics.render())
+
+    def test_multiprocess(self):
+        """Test the files of other processes are added up.
+
+        Gauges of processes that exited and stray files are left out.
+        """
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for name in ('metrics-old.json', 'metrics-.json', 'metrics-1.json.tmp'):
+            with open(os.path.join(directory.name, name), 'w') as f:
+                f.write('{}')
+        for pid in (os.getppid(), _exited_pid()):
+            with open(os.path.join(directory.name, 'metrics-%d.json' % pid), 'w') as f:
+                json.dump({
+                    'types': {'busy': 'gauge'},
+                    'buckets': {},
+                    'samples': [['hits_total', [], 2], ['busy', [], 1]],
+                }, f)
+        metrics.increment('hits_total')
+
+        with override_settings(METRICS_MULTIPROC_DIR=directory.name):
+            text = metrics.render()
+
+        self.assertIn('hits_total 5\n', text)
+        self.assertIn('busy 1\n', text)
+        self.assertTrue(os.path.exists(
+            os.path.join(directory.name, 'metrics-%d.json' % os.getpid())))
+
+
+def _exited_pid():
+    """Return the pid of a process that has exited."""
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class MetricsEndpointTests(TestCase):
+    """Tests for the /metrics endpoint."""
+
+    def setUp(self):
+        metrics.reset()
+        self.client = APIClient()
+
+    def test_request_metrics(self):
+        """Test latency, status and query metrics are exported per URL name."""
+        user = get_user_model().objects.create_user(  # type: ignore
+            email='metrics@example.com', password='metrics-pass-123')
+        self.client.force_authenticate(user)
+        self.client.get(RECIPE_URL)
+        self.client.get('/no-such-page/')
+
+        res = self.client.get(METRICS_URL)
+        text = res.content.decode()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(
+            'http_request_duration_seconds_count'
+            '{method="GET",view="recipe:recipe-list"} 1\n', text)
+        self.assertIn(
+            'http_responses_total'
+            '{method="GET",status="200",view="recipe:recipe-list"} 1\n', text)
+        self.assertIn(
+            'http_responses_total{method="GET",status="404",view="unresolved"} 1\n',
+            text)
+        self.assertIn('http_request_db_queries_count{view="recipe:recipe-list"} 1\n',
+                      text)
+        # Only the scrape itself is still running.
+        self.assertIn('http_requests_in_flight 1\n', text)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_required(self):
+        """Test the endpoint requires the bearer token when one is set."""
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(res.status_code, 200)
@@ -0,0 +1,286 @@
+"""
+Tests for the middleware.
+"""
+import asyncio
+import contextvars
+import gzip
+import threading
+import json
+from decimal import Decimal
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import compression, metrics
+from core.db.instrumentation import QueryBudgetExceeded, instrument, record_queries
+from core.middleware import CompressionMiddleware
+from core.models import Recipe
+from core.testing import QueryBudgetMixin
+
+RECIPE_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+BODY = json.dumps([{'title': 'Recipe %d' % i, 'price': '5.25'}
+                   for i in range(200)]).encode()
+
+
+class NegotiationTests(SimpleTestCase):
+    """Tests for Accept-Encoding negotiation."""
+
+    def test_negotiate(self):
+        """Test q-values win and server preference breaks ties."""
+        preference = ['br', 'zstd', 'gzip']
+        cases = [
+            ('', None),
+            ('identity', None),
+            ('gzip', 'gzip'),
+            ('gzip, deflate, br', 'br'),
+            ('br;q=0.5, gzip', 'gzip'),
+            ('GZIP;Q=0.8, zstd;q=0.9', 'zstd'),
+            ('*', 'br'),
+            ('*, br;q=0', 'zstd'),
+            ('gzip;q=0', None),
+            ('gzip;q=bad', None),
+        ]
+        for header, expected in cases:
+            with self.subTest(header=header):
+                self.assertEqual(
+                    compression.negotiate(header, preference), expected)
+
+
+@override_settings(COMPRESSION_ENCODINGS=['gzip'], COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Tests for CompressionMiddleware."""
+
+    def process(self, response, accept='gzip'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_compresses_json(self):
+        """Test a large JSON response is gzipped."""
+        res = self.process(HttpResponse(BODY, content_type='application/json'))
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(res['Content-Length']), len(res.content))
+        self.assertEqual(gzip.decompress(res.content), BODY)
+
+    def test_not_accepted(self):
+        """Test the response is untouched without a matching coding."""
+        res = self.process(
+            HttpResponse(BODY, content_type='application/json'), accept='br')
+
+        self.assertNotIn('Content-Encoding', res)
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertEqual(res.content, BODY)
+
+    def test_skips_small_and_binary_responses(self):
+        """Test small and non-text responses are not compressed."""
+        responses = [
+            HttpResponse(b'{}', content_type='application/json'),
+            HttpResponse(BODY, content_type='image/png'),
+        ]
+        for response in responses:
+            with self.subTest(response=response):
+                res = self.process(response)
+                self.assertNotIn('Content-Encoding', res)
+                self.assertNotIn('Vary', res)
+
+    def test_strong_etag_made_weak(self):
+        """Test a strong ETag is weakened once the body is compressed."""
+        response = HttpResponse(BODY, content_type='application/json')
+        response['ETag'] = '"abc"'
+        weak = HttpResponse(BODY, content_type='application/json')
+        weak['ETag'] = 'W/"abc"'
+
+        self.assertEqual(self.process(response)['ETag'], 'W/"abc"')
+        self.assertEqual(self.process(weak)['ETag'], 'W/"abc"')
+
+    def test_not_modified(self):
+        """Test a 304 gets the Vary and weak ETag of the compressed response."""
+        for accept, etag in (('gzip', 'W/"abc"'), ('identity', '"abc"')):
+            response = HttpResponseNotModified()
+            response['ETag'] = '"abc"'
+            with self.subTest(accept=accept):
+                res = self.process(response, accept=accept)
+
+                self.assertEqual(res['ETag'], etag)
+                self.assertEqual(res['Vary'], 'Accept-Encoding')
+
+        response = HttpResponseNotModified()
+        response['Content-Type'] = 'image/png'
+        response['ETag'] = '"abc"'
+        res = self.process(response)
+        self.assertEqual(res['ETag'], '"abc"')
+        self.assertNotIn('Vary', res)
+
+    @override_settings(COMPRESSION_STREAM_FLUSH_SIZE=1000)
+    def test_streaming_response(self):
+        """Test streaming responses are compressed chunk by chunk."""
+        lines = [b'{"title": "Recipe %d"}\n' % i for i in range(500)]
+        res = self.process(StreamingHttpResponse(
+            iter(lines), content_type='application/x-ndjson'))
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', res)
+        chunks = list(res.streaming_content)
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual(gzip.decompress(b''.join(chunks)), b''.join(lines))
+
+    def test_async_streaming_response(self):
+        """Test async streaming responses are compressed too."""
+        async def lines():
+            for i in range(100):
+                yield b'{"title": "Recipe %d"}\n' % i
+
+        async def consume(response):
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        res = self.process(StreamingHttpResponse(
+            lines(), content_type='application/x-ndjson'))
+
+        body = asyncio.run(consume(res))
+        self.assertEqual(gzip.decompress(body).count(b'\n'), 100)
+
+    @skipIf(compression.brotli is None, 'brotli is not installed')
+    @override_settings(COMPRESSION_ENCODINGS=['br', 'gzip'])
+    def test_brotli(self):
+        """Test brotli is used when preferred and installed."""
+        res = self.process(HttpResponse(BODY, content_type='application/json'),
+                           accept='gzip, br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(res.content), BODY)
+
+    @skipIf(compression.zstandard is None, 'zstandard is not installed')
+    @override_settings(COMPRESSION_ENCODINGS=['zstd', 'gzip'])
+    def test_zstd(self):
+        """Test zstd is used when preferred and installed."""
+        res = self.process(HttpResponse(BODY, content_type='application/json'),
+                           accept='gzip, zstd')
+
+        self.assertEqual(res['Content-Encoding'], 'zstd')
+        self.assertEqual(
+            compression.zstandard.ZstdDecompressor().decompressobj()
+            .decompress(res.content), BODY)
+
+
+@override_settings(COMPRESSION_ENCODINGS=['gzip'], COMPRESSION_MIN_SIZE=200)
+class RecipeCompressionTests(TestCase):
+    """Tests for compressed Recipe API responses."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(  # type: ignore
+            email='gzip@example.com', password='gzip%pass$203')
+        Recipe.objects.bulk_create(
+            Recipe(user=self.user, title='Recipe %d' % i, time_minutes=10,
+                   price=Decimal('5.25'))
+            for i in range(50)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_compressed_and_conditional(self):
+        """Test the list is gzipped and revalidates with its weak ETag."""
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(res.content))), 50)
+        self.assertTrue(res['ETag'].startswith('W/"'))
+
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT_ENCODING='gzip',
+                              HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, 304)
+        self.assertTrue(res['ETag'].startswith('W/"'))
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_export_compressed(self):
+        """Test the streaming export is gzipped."""
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        body = gzip.decompress(b''.join(res.streaming_content))
+        self.assertEqual(body.count(b'\n'), 50)
+
+
+class QueryInstrumentationTests(QueryBudgetMixin, TestCase):
+    """Tests for per-request query instrumentation."""
+
+    def setUp(self):
+        metrics.reset()
+        self.user = get_user_model().objects.create_user(  # type: ignore
+            email='queries@example.com', password='queries-pass-123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing(self):
+        """Test the query count and SQL time are sent in Server-Timing."""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertRegex(
+            res['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="\d+ queries, 0 duplicates", app;dur=[\d.]+$')
+        self.assertGreater(metrics.get('db_queries_total'), 0)
+
+    @override_settings(QUERY_LOG_SAMPLE_RATE=1)
+    def test_sampled_log(self):
+        """Test sampled requests are logged with their query totals."""
+        with self.assertLogs('core.queries', 'INFO') as logs:
+            self.client.get(RECIPE_URL)
+
+        fields = logs.records[0].queries
+        self.assertEqual(fields['view'], 'recipe:recipe-list')
+        self.assertEqual(fields['status'], 200)
+        self.assertIn('queries=%d' % fields['queries'], logs.output[0])
+
+    @override_settings(QUERY_LOG_SAMPLE_RATE=0, QUERY_BUDGET_MODE='warn',
+                       QUERY_BUDGETS={'recipe:recipe-list': 0})
+    def test_budget_warns(self):
+        """Test a request over its view's budget is logged as a warning."""
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(logs.records[0].queries['budget'], 0)
+        self.assertEqual(metrics.get('db_query_budget_exceeded_total'), 1)
+
+    @override_settings(QUERY_BUDGET_MODE='raise', QUERY_BUDGETS={'recipe:recipe-list': 0})
+    def test_budget_raises(self):
+        """Test a request over budget fails in raise mode."""
+        with self.assertLogs('core.queries', 'WARNING'):
+            with self.assertRaisesMessage(QueryBudgetExceeded, 'recipe:recipe-list ran'):
+                self.client.get(RECIPE_URL)
+
+    def test_assert_max_queries(self):
+        """Test the helper fails on too many or repeated queries."""
+        with self.assertMaxQueries(2, max_duplicates=0):
+            Recipe.objects.count()
+        with self.assertRaisesMessage(AssertionError, '2 queries run, over the budget'):
+            with self.assertMaxQueries(1):
+                Recipe.objects.count()
+                Recipe.objects.count()
+        with self.assertRaisesMessage(AssertionError, '1 duplicate queries run'):
+            with self.assertMaxQueries(2, max_duplicates=0):
+                Recipe.objects.filter(pk=1).exists()
+                Recipe.objects.filter(pk=2).exists()
+
+    def test_queries_counted_across_threads(self):
+        """Test queries run by sync_to_async threads count for the request."""
+        def execute(*args):
+            return 'result'
+        with record_queries() as stats:
+            worker = threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(instrument, execute, 'SELECT 1', None, False, {}))
+            worker.start()
+            worker.join()
+
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(instrument(execute, 'SELECT 1', None, False, {}), 'result')
+        self.assertEqual(stats.count, 1)
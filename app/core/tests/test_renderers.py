@@ -0,0 +1,125 @@
+"""
+Tests for the JSON renderer and parser.
+"""
+import datetime
+import io
+import json
+import uuid
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from django.test import SimpleTestCase
+from django.utils.functional import lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from core import renderers
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+lazy_str = lazy(lambda: 'lazy text', str)
+
+PAYLOADS = [
+    {'price': Decimal('5.50'), 'zero': Decimal('0'), 'cents': Decimal('0.01')},
+    {'when': datetime.datetime(2023, 5, 1, 12, 30, 15, 123456,
+                               tzinfo=datetime.timezone.utc),
+     'day': datetime.date(2023, 5, 1),
+     'time': datetime.time(8, 15),
+     'duration': datetime.timedelta(minutes=90)},
+    {'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+     'label': lazy_str(), 'none': None, 'flag': True},
+    {'text': 'Unicode é \U0001f35c "quoted"\n   </script>'},
+    {1: 'int key', 'nested': [[1, 2.5, -3], {'a': []}]},
+    {'huge': 2 ** 70},
+    ReturnList([ReturnDict({'title': 'Soup', 'price': Decimal('12.00')},
+                           serializer=None)], serializer=None),
+    [],
+]
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Check FastJSONRenderer output matches JSONRenderer."""
+
+    def assertSameOutput(self, data, media_type=None, context=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type, context),
+            JSONRenderer().render(data, media_type, context),
+        )
+
+    @skipIf(renderers.orjson is None, 'orjson is not installed')
+    def test_matches_json_renderer(self):
+        """Test payloads without exponent floats render like JSONRenderer."""
+        for data in PAYLOADS:
+            with self.subTest(data=data):
+                self.assertSameOutput(data)
+
+    @skipIf(renderers.orjson is None, 'orjson is not installed')
+    def test_float_exponents_differ(self):
+        """Test floats with an exponent are spelled differently, same values.
+
+        This is a known divergence from JSONRenderer, harmless to JSON
+        clients.
+        """
+        data = {'small': 1e-7, 'tiny': 1e-5, 'large': 1e16}
+
+        fast = FastJSONRenderer().render(data)
+        stdlib = JSONRenderer().render(data)
+
+        self.assertEqual(fast, b'{"small":1e-7,"tiny":0.00001,"large":1e16}')
+        self.assertEqual(stdlib, b'{"small":1e-07,"tiny":1e-05,"large":1e+16}')
+        self.assertEqual(json.loads(fast), json.loads(stdlib))
+
+    def test_matches_json_renderer_without_orjson(self):
+        """Test the stdlib fallback when orjson is missing."""
+        with mock.patch.object(renderers, 'orjson', None):
+            for data in PAYLOADS:
+                with self.subTest(data=data):
+                    self.assertSameOutput(data)
+
+    def test_indent_and_none(self):
+        """Test indented output and empty data are left to JSONRenderer."""
+        self.assertSameOutput(PAYLOADS[0], 'application/json; indent=4')
+        self.assertSameOutput(PAYLOADS[0], None, {'indent': 2})
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+class FastJSONParserTests(SimpleTestCase):
+    """Check FastJSONParser results match JSONParser."""
+
+    def parse(self, parser, body, encoding='utf-8'):
+        return parser.parse(io.BytesIO(body), 'application/json',
+                            {'encoding': encoding})
+
+    def test_matches_json_parser(self):
+        """Test bodies parse to the same data as JSONParser."""
+        bodies = [
+            b'{"title": "Soup", "price": "5.50", "time_minutes": 10}',
+            '{"text": "Unicode é \U0001f35c"}'.encode(),
+            b'[1, 2.5, null, true, {"nested": []}]',
+            b'{"huge": 1180591620717411303424}',
+        ]
+        for body in bodies:
+            with self.subTest(body=body):
+                self.assertEqual(self.parse(FastJSONParser(), body),
+                                 self.parse(JSONParser(), body))
+
+    def test_other_encoding(self):
+        """Test non UTF-8 bodies are decoded with their charset."""
+        body = '{"title": "Crème"}'.encode('latin-1')
+
+        data = self.parse(FastJSONParser(), body, encoding='latin-1')
+
+        self.assertEqual(data, {'title': 'Crème'})
+
+    def test_invalid_json(self):
+        """Test malformed and non-finite JSON raise the same ParseError."""
+        for body in [b'{"title": ', b'{"price": NaN}', b'']:
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError) as expected:
+                    self.parse(JSONParser(), body)
+                with self.assertRaises(ParseError) as actual:
+                    self.parse(FastJSONParser(), body)
+                self.assertEqual(str(actual.exception),
+                                 str(expected.exception))
@@ -0,0 +1,60 @@
+"""
+Tests for the core views.
+"""
+import socket
+import threading
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.db import readiness
+
+READINESS_URL = reverse('readiness')
+
+
+class ReadinessViewTests(TestCase):
+    """Tests for the readiness endpoint."""
+
+    def test_ready(self):
+        """Test the endpoint reports every database as available."""
+        res = self.client.get(READINESS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['status'], 'ok')
+        self.assertEqual(res.json()['databases']['default'], 'ok')
+        self.assertIn('no-cache', res['Cache-Control'])
+
+    @patch('core.db.readiness.probe_select', side_effect=OSError('refused'))
+    def test_unavailable(self, patched_probe):
+        """Test an unreachable database makes the endpoint return 503."""
+        res = self.client.get(READINESS_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()['databases']['default'], 'refused')
+
+    @override_settings(READINESS_TIMEOUT=0.1)
+    def test_hung_probe(self):
+        """Test a probe still running after READINESS_TIMEOUT reports 503."""
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        with patch('core.db.readiness.probe_select',
+                   side_effect=lambda alias, timeout: release.wait()):
+            res = self.client.get(READINESS_URL)
+
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()['databases']['default'], 'Timed out after 0.1s')
+
+    @override_settings(READINESS_PROBE='tcp')
+    def test_tcp_probe(self):
+        """Test the tcp probe connects to the configured host and port."""
+        server = socket.create_server(('127.0.0.1', 0))
+        self.addCleanup(server.close)
+        port = server.getsockname()[1]
+        dbs = {'default': {'HOST': '127.0.0.1', 'PORT': port}}
+
+        with patch.object(readiness.connections, 'settings', dbs):
+            self.assertIsNone(readiness.probe('default', 'tcp'))
+            server.close()
+            self.assertIsNotNone(readiness.probe('default', 'tcp', timeout=0.5))
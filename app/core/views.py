@@ -0,0 +1,36 @@
+"""
+Views for the core app.
+"""
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views.decorators.cache import never_cache
+
+from core import metrics
+from core.db import readiness as db_readiness
+
+
+@never_cache
+def readiness(request):
+    """Report whether every database accepts connections."""
+    errors = db_readiness.probe_all(
+        settings.DATABASES, mode=settings.READINESS_PROBE,
+        timeout=settings.READINESS_TIMEOUT)
+    ready = not any(errors.values())
+    return JsonResponse({
+        'status': 'ok' if ready else 'unavailable',
+        'databases': {alias: error or 'ok' for alias, error in errors.items()},
+    }, status=200 if ready else 503)
+
+
+@never_cache
+def export_metrics(request):
+    """Return the metrics of every worker in Prometheus text format."""
+    if settings.METRICS_TOKEN:
+        expected = 'Bearer %s' % settings.METRICS_TOKEN
+        if not hmac.compare_digest(
+                request.META.get('HTTP_AUTHORIZATION', '').encode(), expected.encode()):
+            return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,131 @@
+"""Per-user response cache for Recipe Api"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+from core import metrics
+
+
+def get_cache():
+    """Return the cache backend holding recipe responses."""
+    return caches[settings.RECIPE_CACHE_ALIAS]
+
+
+def version_key(user_id):
+    return 'recipe:version:%s' % user_id
+
+
+def new_version():
+    """Return a version that cannot collide with an evicted one."""
+    return time.time_ns()
+
+
+def get_version(user_id):
+    """Return the current response version of a user."""
+    cache = get_cache()
+    key = version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(user_id):
+    """Async variant of `get_version`."""
+    cache = get_cache()
+    key = version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, new_version(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(user_id):
+    """Invalidate every cached response of a user."""
+    cache = get_cache()
+    key = version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, new_version(), None)
+
+
+def invalidate(user_id):
+    """Drop a user's cached responses now and again on commit.
+
+    The second bump keeps a response rendered from the pre-commit state by
+    a concurrent request from being served.
+    """
+    bump_version(user_id)
+    transaction.on_commit(lambda: bump_version(user_id))
+
+
+def response_key(request, last_modified, version=None):
+    """Return the cache key for a request of the authenticated user.
+
+    The key includes when the recipes last changed, so writes that skip the
+    version bump, such as another process's, never leave a stale body
+    behind a new ETag.
+    """
+    if version is None:
+        version = get_version(request.user.pk)
+    variant = '%s|%s|%s' % (
+        request.get_full_path(), request.accepted_media_type,
+        last_modified.isoformat())
+    return 'recipe:response:%s:%s:%s' % (
+        request.user.pk,
+        version,
+        hashlib.sha1(variant.encode()).hexdigest(),
+    )
+
+
+async def aresponse_key(request, last_modified):
+    """Async variant of `response_key`."""
+    version = await aget_version(request.user.pk)
+    return response_key(request, last_modified, version)
+
+
+def to_response(cached):
+    """Return the response for a cached value, counting hits and misses."""
+    if cached is None:
+        metrics.increment('recipe_response_cache_misses_total')
+        return None
+    metrics.increment('recipe_response_cache_hits_total')
+    content, content_type = cached
+    return HttpResponse(content, content_type=content_type)
+
+
+def get_response(key):
+    """Return the cached response for a key, or None."""
+    return to_response(get_cache().get(key))
+
+
+async def aget_response(key):
+    """Async variant of `get_response`."""
+    return to_response(await get_cache().aget(key))
+
+
+def set_response(key, response):
+    """Store the rendered bytes of a response."""
+    response.render()
+    get_cache().set(
+        key,
+        (response.content, response['Content-Type']),
+        settings.RECIPE_CACHE_TTL,
+    )
+
+
+async def aset_response(key, response):
+    """Async variant of `set_response`."""
+    response.render()
+    await get_cache().aset(
+        key,
+        (response.content, response['Content-Type']),
+        settings.RECIPE_CACHE_TTL,
+    )
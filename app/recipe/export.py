@@ -0,0 +1,26 @@
+"""Streaming encoders for Recipe exports"""
+import csv
+
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class Echo:
+    """File-like object handing each written line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(rows):
+    """Yield one JSON document per row."""
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+def csv_lines(rows, fields):
+    """Yield a CSV header followed by one line per row."""
+    writer = csv.DictWriter(Echo(), fieldnames=list(fields))
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
@@ -0,0 +1,98 @@
+"""Filters for Recipe Api"""
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+from rest_framework.filters import BaseFilterBackend
+
+from recipe.serializers import RecipeFilterSerializer
+
+
+class RecipeRangeFilter(BaseFilterBackend):
+    """Filter recipes by price and time ranges and order them.
+
+    Every ordering ends with id in the same direction, so equal keys come
+    back in a stable order that keyset pagination can seek on, walking the
+    (user_id, key, id) indexes forwards or backwards.
+    """
+    lookups = {
+        'price_min': 'price__gte',
+        'price_max': 'price__lte',
+        'time_min': 'time_minutes__gte',
+        'time_max': 'time_minutes__lte',
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        """Return the recipes in range, in the requested order."""
+        serializer = RecipeFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        queryset = queryset.filter(**{
+            lookup: params[param]
+            for param, lookup in self.lookups.items() if param in params
+        })
+        ordering = params.get('ordering')
+        if ordering and ordering.lstrip('-') != 'id':
+            tie_breaker = '-id' if ordering.startswith('-') else 'id'
+            queryset = queryset.order_by(ordering, tie_breaker)
+        elif ordering:
+            queryset = queryset.order_by(ordering)
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': name,
+                'required': False,
+                'in': 'query',
+                'description': description,
+                'schema': schema,
+            }
+            for name, description, schema in (
+                ('price_min', 'Minimum price.', {'type': 'number'}),
+                ('price_max', 'Maximum price.', {'type': 'number'}),
+                ('time_min', 'Minimum time in minutes.', {'type': 'integer'}),
+                ('time_max', 'Maximum time in minutes.', {'type': 'integer'}),
+                ('ordering', 'Sort key.', {
+                    'type': 'string',
+                    'enum': RecipeFilterSerializer.ORDERING_CHOICES,
+                }),
+            )
+        ]
+
+
+class RecipeSearchFilter(BaseFilterBackend):
+    """Full-text search over recipe title and description.
+
+    On PostgreSQL the trigger-maintained search_vector column and its GIN
+    index are used and results are ranked by relevance, with the queryset
+    ordering as tie-breaker. Other databases fall back to substring search.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        """Return the recipes matching the search term, best first."""
+        term = request.query_params.get(self.search_param, '').strip()
+        if not term:
+            return queryset
+
+        if connection.vendor != 'postgresql':
+            return queryset.filter(
+                Q(title__icontains=term) | Q(description__icontains=term))
+
+        query = SearchQuery(term, search_type='websearch', config='english')
+        # SearchRank is a real, cast to double precision so the rank kept
+        # in a pagination cursor compares equal to the row it came from.
+        return queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField()),
+        ).order_by('-rank', *queryset.query.order_by)
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Full-text search over title and description.',
+            'schema': {'type': 'string'},
+        }]
@@ -0,0 +1,185 @@
+"""Pagination for Recipe Api"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Opaque cursor pagination seeking on the queryset ordering.
+
+    The cursor holds the ordering values of the last row of a page, so the
+    next page is a range condition on the index instead of an OFFSET, and
+    no COUNT query is ever issued. Pagination is only applied when the
+    client asks for it with a `cursor` or `page_size` parameter.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        """Return the requested page size, clamped to the maximum."""
+        page_size = settings.RECIPE_PAGE_SIZE
+        if self.page_size_query_param in request.query_params:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+            except ValueError:
+                pass
+        return max(1, min(page_size, settings.RECIPE_MAX_PAGE_SIZE))
+
+    def get_ordering(self, queryset):
+        """Return the ordering of the queryset as (field, descending) pairs."""
+        ordering = []
+        for field in queryset.query.order_by:
+            if field.startswith('-'):
+                ordering.append((field[1:], True))
+            else:
+                ordering.append((field, False))
+        return ordering
+
+    def get_ordering_field(self, queryset, name):
+        """Return the model field or annotation output field called name."""
+        if name in queryset.query.annotations:
+            return queryset.query.annotations[name].output_field
+        return queryset.model._meta.get_field(name)
+
+    def decode_cursor(self, request, queryset):
+        """Return the position encoded in the request cursor, if any.
+
+        Each value is converted with its ordering field, so a tampered
+        cursor is rejected here instead of failing in the query.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(_('Invalid cursor'))
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(_('Invalid cursor'))
+
+        values = []
+        for (name, _descending), value in zip(self.ordering, position):
+            if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+                raise NotFound(_('Invalid cursor'))
+            try:
+                value = self.get_ordering_field(queryset, name).to_python(value)
+            except ValidationError:
+                raise NotFound(_('Invalid cursor'))
+            if value is None:
+                raise NotFound(_('Invalid cursor'))
+            values.append(value)
+        return values
+
+    def encode_cursor(self, row):
+        """Return an opaque cursor pointing after the given row."""
+        position = []
+        for field, _descending in self.ordering:
+            value = row[field] if isinstance(row, dict) else getattr(row, field)
+            position.append(value if isinstance(value, (int, float)) else str(value))
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def seek(self, queryset, position):
+        """Filter the queryset to the rows after the given position."""
+        condition = Q()
+        equal = Q()
+        for (field, descending), value in zip(self.ordering, position):
+            lookup = '%s__%s' % (field, 'lt' if descending else 'gt')
+            condition |= equal & Q(**{lookup: value})
+            equal &= Q(**{field: value})
+        if len(self.ordering) > 1:
+            # Redundant bound on the leading key, so the database can start
+            # the index scan at the position instead of filtering up to it.
+            field, descending = self.ordering[0]
+            lookup = '%s__%s' % (field, 'lte' if descending else 'gte')
+            condition &= Q(**{lookup: position[0]})
+        return queryset.filter(condition)
+
+    def get_page_queryset(self, queryset, request):
+        """Return the query for the requested page, or None if not requested."""
+        params = request.query_params
+        if (self.cursor_query_param not in params
+                and self.page_size_query_param not in params):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        position = self.decode_cursor(request, queryset)
+        if position is not None:
+            queryset = self.seek(queryset, position)
+        # One extra row tells whether there is a next page.
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        """Keep and return the page part of the fetched results."""
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return a single page of results, or None if not requested."""
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Async variant of `paginate_queryset`."""
+        queryset = self.get_page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self.set_page([row async for row in queryset])
+
+    def get_next_link(self):
+        """Return the url of the next page, if there is one."""
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        """Return the page with a link to the next one."""
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
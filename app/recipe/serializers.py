@@ -1,17 +1,137 @@
 """Serializers for Recipe API."""
+import decimal
+
+from django.utils import timezone
+from django.utils.translation import gettext as _
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from core.models import Recipe
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(serializers.ListSerializer):
+    """Serializer writing many recipes with one query."""
+
+    def create(self, validated_data):
+        """Insert all recipes with a single bulk INSERT."""
+        return Recipe.objects.bulk_create(
+            [Recipe(**attrs) for attrs in validated_data])
+
+    def update(self, instance, validated_data):
+        """Update each recipe with its own attrs in a single bulk UPDATE."""
+        fields = {'updated_at'}
+        now = timezone.now()
+        for recipe, attrs in zip(instance, validated_data):
+            for attr, value in attrs.items():
+                setattr(recipe, attr, value)
+            fields.update(attrs)
+            recipe.updated_at = now
+        Recipe.objects.bulk_update(instance, sorted(fields))
+        return instance
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    """ModelSerializer taking a `fields` argument to limit its output."""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeSerializer(DynamicFieldsModelSerializer):
     """Serializer Recipe"""
     class Meta:
         model = Recipe
         fields = ['id', 'title', 'time_minutes', 'price', 'link']
         read_only_fields = ['id']
+        list_serializer_class = RecipeListSerializer
 
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for Recipe Detail view."""
     class Meta(RecipeSerializer.Meta):
         fields = RecipeSerializer.Meta.fields + ['description']
+
+
+class RecipeFilterSerializer(serializers.Serializer):
+    """Serializer for Recipe list filter and ordering parameters."""
+    ORDERING_CHOICES = ['id', '-id', 'price', '-price',
+                        'time_minutes', '-time_minutes']
+
+    price_min = serializers.DecimalField(
+        max_digits=5, decimal_places=2, required=False)
+    price_max = serializers.DecimalField(
+        max_digits=5, decimal_places=2, required=False)
+    time_min = serializers.IntegerField(min_value=0, required=False)
+    time_max = serializers.IntegerField(min_value=0, required=False)
+    ordering = serializers.ChoiceField(
+        choices=ORDERING_CHOICES, required=False)
+
+    def validate(self, attrs):
+        """Check that every range is not empty."""
+        for low, high in (('price_min', 'price_max'), ('time_min', 'time_max')):
+            if low in attrs and high in attrs and attrs[low] > attrs[high]:
+                raise serializers.ValidationError(
+                    {low: _('Must not be greater than %s.') % high})
+        return attrs
+
+
+class RecipeFastSerializer:
+    """Read-only serializer turning `.values()` rows into recipe dicts.
+
+    Produces exactly the output of the given ModelSerializer class, but uses
+    per-field converters worked out once up front instead of running the
+    DRF field machinery for every value of every row.
+    """
+
+    def __init__(self, serializer_class, fields=None):
+        declared = serializer_class(fields=fields).fields
+        self.fields = list(declared)
+        self.converters = [
+            (name, self.get_converter(field)) for name, field in declared.items()
+        ]
+
+    @staticmethod
+    def get_converter(field):
+        """Return a fast function equivalent to field.to_representation."""
+        if type(field) is serializers.IntegerField:
+            return int
+        if type(field) is serializers.CharField:
+            return str
+        if (type(field) is serializers.DecimalField and not field.localize
+                and field.decimal_places is not None
+                and getattr(field, 'coerce_to_string',
+                            api_settings.COERCE_DECIMAL_TO_STRING)):
+            quantum = decimal.Decimal('.1') ** field.decimal_places
+            context = decimal.getcontext().copy()
+            if field.max_digits is not None:
+                context.prec = field.max_digits
+            rounding = field.rounding
+
+            def convert(value):
+                if not isinstance(value, decimal.Decimal):
+                    value = decimal.Decimal(str(value).strip())
+                return '{:f}'.format(
+                    value.quantize(quantum, rounding=rounding, context=context))
+            return convert
+        return field.to_representation
+
+    def to_representation(self, row):
+        """Return the representation of a single `.values()` row."""
+        return {
+            name: None if row[name] is None else convert(row[name])
+            for name, convert in self.converters
+        }
+
+    def many(self, rows):
+        """Return the representations of many `.values()` rows."""
+        converters = self.converters
+        return [
+            {
+                name: None if row[name] is None else convert(row[name])
+                for name, convert in converters
+            }
+            for row in rows
+        ]
@@ -0,0 +1,64 @@
+"""Signal handlers keeping recipe change tracking up to date."""
+import contextlib
+import contextvars
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Recipe, RecipeTombstone
+from recipe import cache
+
+_batch = contextvars.ContextVar('recipe_change_batch', default=None)
+
+
+def touch_recipes(user_id):
+    """Record that the recipes of a user changed and drop cached responses."""
+    get_user_model().objects.filter(pk=user_id).update(
+        recipes_modified_at=timezone.now())
+    cache.invalidate(user_id)
+
+
+@contextlib.contextmanager
+def batched_deletes():
+    """Collect tombstones of deleted recipes and write them in one go.
+
+    Yields the list of deleted recipes as (user_id, recipe_id) pairs.
+    """
+    deleted = []
+    token = _batch.set(deleted)
+    try:
+        yield deleted
+    finally:
+        _batch.reset(token)
+    RecipeTombstone.objects.bulk_create(
+        RecipeTombstone(user_id=user_id, recipe_id=recipe_id)
+        for user_id, recipe_id in deleted
+    )
+    for user_id in {user_id for user_id, _recipe_id in deleted}:
+        touch_recipes(user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    """Move the owner's watermark forward on every write."""
+    touch_recipes(instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, origin=None, **kwargs):
+    """Leave a tombstone so syncing clients learn about the delete."""
+    User = get_user_model()
+    # origin is the user for user.delete() and the queryset for
+    # User.objects.filter(...).delete(), as in seed_data --reset.
+    if isinstance(origin, User) or getattr(origin, 'model', None) is User:
+        # The whole account is going away, tombstones included.
+        return
+    batch = _batch.get()
+    if batch is not None:
+        batch.append((instance.user_id, instance.pk))
+        return
+    RecipeTombstone.objects.create(user_id=instance.user_id,
+                                   recipe_id=instance.pk)
+    touch_recipes(instance.user_id)
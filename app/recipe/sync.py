@@ -0,0 +1,42 @@
+"""Sync tokens for the incremental Recipe sync feed"""
+import base64
+import binascii
+import datetime
+
+from django.utils.translation import gettext as _
+from rest_framework import serializers
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def encode_token(moment):
+    """Return an opaque sync token for a point in time."""
+    micros = (moment - EPOCH) // MICROSECOND
+    return base64.urlsafe_b64encode(str(micros).encode()).decode()
+
+
+def decode_token(token):
+    """Return the point in time encoded in a sync token."""
+    try:
+        micros = int(base64.urlsafe_b64decode(token.encode()))
+        return EPOCH + micros * MICROSECOND
+    except (ValueError, OverflowError, binascii.Error):
+        raise serializers.ValidationError(
+            {'since': _('Invalid sync token.')}, code='invalid')
+
+
+def encode_cursor(started, last_id):
+    """Return a cursor continuing a sync started at a point in time."""
+    micros = (started - EPOCH) // MICROSECOND
+    return base64.urlsafe_b64encode(('%d:%d' % (micros, last_id)).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return the (started, last_id) pair encoded in a sync cursor."""
+    try:
+        micros, last_id = base64.urlsafe_b64decode(cursor.encode()).split(b':')
+        return EPOCH + int(micros) * MICROSECOND, int(last_id)
+    except (ValueError, OverflowError, binascii.Error):
+        raise serializers.ValidationError(
+            {'cursor': _('Invalid sync cursor.')}, code='invalid')
@@ -0,0 +1,165 @@
+"""Tests for the async read paths of the Recipe and user APIs."""
+import asyncio
+import json
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe
+from recipe.views import RecipeViewSet
+from user.authentication import token_cache
+from user.views import ManageUserView
+
+
+class AsyncOnlyCache(LocMemCache):
+    """Local memory cache failing on any blocking call."""
+
+    def _blocking(self, *args, **kwargs):
+        raise AssertionError('Blocking cache call on the async path.')
+
+    get = set = add = has_key = incr = _blocking
+
+    async def aget(self, key, default=None, version=None):
+        return LocMemCache.get(self, key, default, version)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        LocMemCache.set(self, key, value, timeout, version)
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return LocMemCache.add(self, key, value, timeout, version)
+
+    async def ahas_key(self, key, version=None):
+        return LocMemCache.has_key(self, key, version)
+
+
+@override_settings(API_ASYNC_VIEWS=True)
+class AsyncReadViewTests(TestCase):
+    """Tests for the RecipeViewSet and ManageUserView async endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(  # type: ignore
+            email='async@example.com', password='async%pass$203', name='Async')
+        cls.token = Token.objects.create(user=cls.user)
+        Recipe.objects.bulk_create(
+            Recipe(user=cls.user, title='Recipe %d' % i, time_minutes=i,
+                   price=Decimal('5.25'))
+            for i in range(5)
+        )
+        cls.recipe = Recipe.objects.filter(user=cls.user).first()
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.factory = AsyncRequestFactory()
+        self.list_view = RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+        self.detail_view = RecipeViewSet.as_view({'get': 'retrieve'})
+
+    def request(self, method='get', path='/', data=None, headers=None, **extra):
+        """Return an ASGI request authenticated with the user token."""
+        headers = {'authorization': 'Token %s' % self.token.key, **(headers or {})}
+        return getattr(self.factory, method)(path, data, headers=headers, **extra)
+
+    def sync_get(self, actions, **kwargs):
+        """Return the response of the sync view for a GET request."""
+        with override_settings(API_ASYNC_VIEWS=False):
+            view = RecipeViewSet.as_view(actions)
+        return view(self.request(), **kwargs)
+
+    def test_views_are_coroutines(self):
+        """Test the endpoints are async only when enabled."""
+        self.assertTrue(asyncio.iscoroutinefunction(self.list_view))
+        self.assertTrue(asyncio.iscoroutinefunction(ManageUserView.as_view()))
+        with override_settings(API_ASYNC_VIEWS=False):
+            view = RecipeViewSet.as_view({'get': 'list'})
+        self.assertFalse(asyncio.iscoroutinefunction(view))
+
+    async def test_list_matches_sync(self):
+        """Test the async list renders the same payload as the sync one."""
+        res = await self.list_view(self.request())
+        expected = await sync_to_async(self.sync_get)({'get': 'list'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.content, expected.content)
+        self.assertEqual(len(json.loads(res.content)), 5)
+
+    async def test_caches_used_without_blocking(self):
+        """Test the async path only uses the async cache API."""
+        shared = {'default': {'BACKEND': 'recipe.tests.test_async_views.AsyncOnlyCache'}}
+        with override_settings(TOKEN_AUTH_CACHE_ALIAS='default', CACHES=shared):
+            await self.list_view(self.request())
+            res = await self.list_view(self.request())
+            self.assertTrue(await caches['default'].ahas_key(
+                token_cache.cache_key(self.token.key)))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json.loads(res.content)), 5)
+
+    async def test_list_paginated_and_filtered(self):
+        """Test keyset pages and filters work on the async path."""
+        res = await self.list_view(self.request(
+            data={'page_size': 2, 'ordering': 'time_minutes', 'time_max': 3}))
+
+        data = json.loads(res.content)
+        self.assertEqual([r['time_minutes'] for r in data['results']], [0, 1])
+        self.assertIsNotNone(data['next'])
+
+    async def test_list_not_modified(self):
+        """Test a current ETag is answered with 304."""
+        res = await self.list_view(self.request())
+
+        res = await self.list_view(
+            self.request(headers={'if-none-match': res['ETag']}))
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_retrieve(self):
+        """Test retrieving a recipe and a missing one."""
+        res = await self.detail_view(self.request(), pk=self.recipe.pk)
+        missing = await self.detail_view(self.request(), pk=10 ** 9)
+
+        self.assertEqual(json.loads(res.content)['id'], self.recipe.pk)
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_invalid_token(self):
+        """Test a bad token is rejected like the sync view does."""
+        request = self.request(headers={'authorization': 'Token nope'})
+
+        res = await self.list_view(request)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+        self.assertEqual(json.loads(res.content), {'detail': 'Invalid token.'})
+
+    async def test_token_lookup_is_cached(self):
+        """Test the async authentication shares the token cache."""
+        await self.list_view(self.request())
+
+        self.assertIsNotNone(token_cache.get(self.token.key))
+
+    async def test_writes_and_browsable_api_use_sync_view(self):
+        """Test non-read and HTML requests are forwarded to the sync view."""
+        res = await self.list_view(self.request(
+            'post', data={'title': 'Posted', 'time_minutes': 5, 'price': '1.00'},
+            content_type='application/json'))
+        html = await self.list_view(
+            self.request(headers={'accept': 'text/html'}))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(await Recipe.objects.filter(title='Posted').aexists())
+        self.assertEqual(html.status_code, status.HTTP_200_OK)
+        self.assertIn('text/html', html['Content-Type'])
+
+    async def test_manage_user(self):
+        """Test the me endpoint returns the authenticated user."""
+        res = await ManageUserView.as_view()(self.request())
+
+        self.assertEqual(json.loads(res.content),
+                         {'email': self.user.email, 'name': 'Async'})
@@ -0,0 +1,119 @@
+"""Query plan guarantees for the Recipe API hot paths."""
+import unittest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Recipe
+from recipe.filters import RecipeRangeFilter, RecipeSearchFilter
+from recipe.pagination import KeysetPagination
+from recipe.views import RecipeViewSet
+
+
+def view_queryset(user, action, **params):
+    """Return the queryset RecipeViewSet builds for an action."""
+    request = Request(APIRequestFactory().get('/', params))
+    request.user = user
+    view = RecipeViewSet(request=request, action=action, kwargs={},
+                         format_kwarg=None)
+    return view.get_queryset()
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql',
+                     'Query plans are only checked on PostgreSQL')
+class RecipeQueryPlanTests(TestCase):
+    """Fail if recipe queries stop using an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            get_user_model().objects.create_user(  # type: ignore
+                email='plan%d@example.com' % i, password='planpass#123')
+            for i in range(4)
+        ]
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=users[i % len(users)],
+                title='Recipe %d' % i,
+                time_minutes=i % 90,
+                price=Decimal('5.25'),
+            )
+            for i in range(400)
+        )
+        cls.user = users[0]
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_recipe')
+            # Tiny test tables make a sequential scan look cheap; the point is
+            # whether an index *can* serve the query, so rule seq scans out.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertIndexScan(self, queryset):
+        """Assert the plan reads through an index and does not sort."""
+        plan = queryset.explain()
+        self.assertIn('Index', plan, plan)
+        self.assertNotIn('Seq Scan', plan, plan)
+        self.assertNotIn('Sort', plan, plan)
+
+    def test_list_query_uses_index(self):
+        """Test the list query is served by the (user_id, id) index."""
+        queryset = view_queryset(self.user, 'list')
+
+        self.assertIndexScan(queryset[:50])
+
+    def test_list_seek_query_uses_index(self):
+        """Test a keyset page seek is served by the (user_id, id) index."""
+        last = view_queryset(self.user, 'list')[10]
+        queryset = view_queryset(self.user, 'list').filter(id__lt=last.id)
+
+        self.assertIndexScan(queryset[:50])
+
+    def test_sorted_range_seek_uses_index(self):
+        """Test a filtered, price-sorted page seek is served by an index."""
+        params = {'ordering': 'price', 'price_min': '1.00', 'time_max': 60}
+        request = Request(APIRequestFactory().get('/', params))
+        queryset = RecipeRangeFilter().filter_queryset(
+            request, view_queryset(self.user, 'list'), None)
+        paginator = KeysetPagination()
+        paginator.ordering = paginator.get_ordering(queryset)
+
+        queryset = paginator.seek(queryset, ['5.25', 100])
+
+        self.assertIndexScan(queryset[:50])
+
+    def test_detail_query_uses_index(self):
+        """Test the detail query is served by an index."""
+        recipe = Recipe.objects.filter(user=self.user).first()
+        queryset = view_queryset(self.user, 'retrieve').filter(pk=recipe.pk)
+
+        self.assertIndexScan(queryset)
+
+    def test_search_query_uses_gin_index(self):
+        """Test full-text search is served by the GIN index."""
+        queryset = RecipeSearchFilter().filter_queryset(
+            Request(APIRequestFactory().get('/', {'search': 'recipe'})),
+            view_queryset(self.user, 'list'),
+            None,
+        )
+
+        plan = queryset[:50].explain()
+        self.assertIn('recipe_search_vector_gin', plan, plan)
+
+    def test_autocomplete_query_uses_trigram_index(self):
+        """Test autocomplete matches titles and the user in the trigram index."""
+        queryset = view_queryset(self.user, 'autocomplete').filter(
+            title__trigram_word_similar='recipe')
+
+        plan = queryset.values_list('id', 'title')[:10].explain()
+        lines = plan.splitlines()
+        scans = [i for i, line in enumerate(lines)
+                 if 'Index Scan on recipe_user_title_trgm_gin' in line]
+        self.assertTrue(scans, plan)
+        condition = lines[scans[0] + 1]
+        self.assertIn('Index Cond', condition, plan)
+        self.assertIn('user_id', condition, plan)
@@ -1,17 +1,36 @@
 """Tests for Recipe API."""
+import base64
+import csv
+import json
+import unittest
+from datetime import timedelta
 from decimal import Decimal
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
-from core.models import Recipe
+from core import metrics
+from core.models import Recipe, RecipeTombstone
+from core.testing import QueryBudgetMixin
+from recipe.cache import get_version
 from recipe.serializers import (
     RecipeSerializer,
     RecipeDetailSerializer
 )
+from recipe.signals import touch_recipes
+from recipe.sync import encode_token
+from recipe.views import RecipeViewSet
 
 RECIPE_URL = reverse('recipe:recipe-list')
+SYNC_URL = reverse('recipe:recipe-sync')
+BULK_URL = reverse('recipe:recipe-bulk')
+EXPORT_URL = reverse('recipe:recipe-export')
+AUTOCOMPLETE_URL = reverse('recipe:recipe-autocomplete')
 
 
 def create_user(**params):
@@ -53,10 +72,11 @@ class PublicRecipeApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateRecipeApiTest(TestCase):
+class PrivateRecipeApiTest(QueryBudgetMixin, TestCase):
     """Tests for Authenticated api requests"""
 
     def setUp(self) -> None:
+        cache.clear()
         self.client = APIClient()
         self.user = create_user(email='user@example.com',
                                 password='testuserpass#1234')
@@ -75,6 +95,16 @@ class PrivateRecipeApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)  # type: ignore
 
+    def test_retrieve_recipes_query_budget(self):
+        """Test listing recipes runs a fixed number of queries."""
+        for _ in range(20):
+            create_recipe(user=self.user)
+
+        with self.assertMaxQueries(RecipeViewSet.query_budget, max_duplicates=0):
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.json()), 20)
+
     def test_recipe_list_limited_to_user(self):
         """Test if a user can't view other user's recipes."""
         other_user = create_user(
@@ -199,3 +229,626 @@ class PrivateRecipeApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
         self.assertTrue(Recipe.objects.filter(
             id=recipe.id).exists())  # type: ignore
+
+    def test_list_paginated_with_cursor(self):
+        """Test paging through recipes with a keyset cursor."""
+        recipes = [create_recipe(user=self.user) for _ in range(5)]
+        recipes.reverse()
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],  # type: ignore
+            [r.id for r in recipes[:2]],  # type: ignore
+        )
+
+        seen = []
+        url = RECIPE_URL + '?page_size=2'
+        while url:
+            page = self.client.get(url).json()
+            seen += [r['id'] for r in page['results']]
+            url = page['next']
+
+        self.assertEqual(seen, [r.id for r in recipes])  # type: ignore
+
+    def test_list_paginated_does_not_count(self):
+        """Test a paginated list runs a single page query and no COUNT."""
+        for _ in range(3):
+            create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(res.data['next'])  # type: ignore
+
+        recipe_queries = [q['sql'] for q in queries if 'core_recipe' in q['sql']]
+        self.assertEqual(len(recipe_queries), 1)
+        self.assertNotIn('COUNT', recipe_queries[0])
+
+    def test_list_invalid_cursor(self):
+        """Test an invalid cursor returns 404."""
+        res = self.client.get(RECIPE_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_cursor_values_validated(self):
+        """Test cursor values that do not fit the ordering fields return 404."""
+        create_recipe(user=self.user)
+        cases = [
+            ({}, ['abc']), ({}, [None]), ({}, [{'a': 1}]), ({}, [True]),
+            ({'ordering': 'price'}, ['abc', 1]),
+            ({'ordering': 'price'}, [None, 1]),
+            ({'ordering': 'price'}, [{'a': 1}, 1]),
+            ({'ordering': 'price'}, ['1.00', 'abc']),
+        ]
+        for params, position in cases:
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode())
+            with self.subTest(params=params, position=position):
+                res = self.client.get(
+                    RECIPE_URL, dict(params, cursor=cursor.decode()))
+
+                self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_served_from_cache(self):
+        """Test a repeated list is served from the response cache."""
+        create_recipe(user=self.user)
+        metrics.reset()
+        res = self.client.get(RECIPE_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(RECIPE_URL)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.content, res.content)
+        self.assertFalse(any('core_recipe' in q['sql'] for q in queries))
+        self.assertEqual(metrics.get('recipe_response_cache_hits_total'), 1)
+        self.assertEqual(metrics.get('recipe_response_cache_misses_total'), 1)
+
+    def test_cache_invalidated_on_write(self):
+        """Test creating, updating and deleting invalidate cached lists."""
+        recipe = create_recipe(user=self.user, title='Old Title')
+        self.client.get(RECIPE_URL)
+        self.client.get(detail_url(recipe.id))  # type: ignore
+
+        self.client.patch(detail_url(recipe.id), {'title': 'New Title'})  # type: ignore
+        res = self.client.get(detail_url(recipe.id))  # type: ignore
+        self.assertEqual(res.json()['title'], 'New Title')
+
+        self.client.post(RECIPE_URL, {
+            'title': 'Another', 'time_minutes': 5, 'price': Decimal('1.00')})
+        self.assertEqual(len(self.client.get(RECIPE_URL).json()), 2)
+
+        self.client.delete(detail_url(recipe.id))  # type: ignore
+        self.assertEqual(len(self.client.get(RECIPE_URL).json()), 1)
+
+    def test_cache_keyed_by_watermark(self):
+        """Test a write that skips the version bump still serves fresh data.
+
+        Another worker's write moves the watermark without touching this
+        process's cache.
+        """
+        recipe = create_recipe(user=self.user, title='Old Title')
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        Recipe.objects.filter(pk=recipe.pk).update(title='New Title')
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            recipes_modified_at=timezone.now() + timedelta(seconds=1))
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()[0]['title'], 'New Title')
+
+    def test_cache_invalidated_outside_views(self):
+        """Test writes through the ORM or touch_recipes drop cached lists."""
+        recipe = create_recipe(user=self.user, title='Old Title')
+        self.client.get(RECIPE_URL)
+        version = get_version(self.user.pk)
+
+        recipe.title = 'New Title'
+        recipe.save()
+        self.assertNotEqual(get_version(self.user.pk), version)
+        self.assertEqual(self.client.get(RECIPE_URL).json()[0]['title'], 'New Title')
+
+        Recipe.objects.filter(pk=recipe.pk).update(title='Bulk Title')
+        touch_recipes(self.user.pk)
+        self.assertEqual(self.client.get(RECIPE_URL).json()[0]['title'], 'Bulk Title')
+
+        recipe.delete()
+        self.assertEqual(self.client.get(RECIPE_URL).json(), [])
+
+    def test_cache_is_per_user(self):
+        """Test a cached list is never served to another user."""
+        create_recipe(user=self.user)
+        self.client.get(RECIPE_URL)
+        other_user = create_user(
+            email='cache2@example.com', password='test%pass$203')
+        self.client.force_authenticate(other_user)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.json(), [])
+
+    def test_list_not_modified(self):
+        """Test an unchanged list is answered with 304 after one query."""
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_list_modified_after_write(self):
+        """Test writing a recipe changes the list ETag."""
+        recipe = create_recipe(user=self.user)
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        self.client.delete(detail_url(recipe.id))  # type: ignore
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_detail_not_modified(self):
+        """Test an unchanged recipe is answered with 304."""
+        recipe = create_recipe(user=self.user)
+        url = detail_url(recipe.id)  # type: ignore
+        res = self.client.get(url)
+
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_other_user_recipe_not_conditional(self):
+        """Test another user's recipe is still not found."""
+        other_user = create_user(
+            email='etag@example.com', password='test%pass$203')
+        recipe = create_recipe(user=other_user)
+
+        res = self.client.get(detail_url(recipe.id))  # type: ignore
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', res)
+
+    def test_sync_without_token_returns_everything(self):
+        """Test a first sync returns all recipes and a token."""
+        recipes = [create_recipe(user=self.user) for _ in range(2)]
+        create_recipe(user=create_user(email='sync@example.com',
+                                       password='test%pass$203'))
+
+        res = self.client.get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in res.data['changed']],  # type: ignore
+            [r.id for r in recipes],  # type: ignore
+        )
+        self.assertEqual(res.data['deleted'], [])  # type: ignore
+        self.assertTrue(res.data['sync_token'])  # type: ignore
+
+    @override_settings(RECIPE_SYNC_OVERLAP_SECONDS=0)
+    def test_sync_returns_changes_since_token(self):
+        """Test a sync returns only changes and tombstones since the token."""
+        unchanged = create_recipe(user=self.user)
+        updated = create_recipe(user=self.user)
+        deleted = create_recipe(user=self.user)
+        token = self.client.get(SYNC_URL).data['sync_token']  # type: ignore
+
+        self.client.patch(detail_url(updated.id), {'title': 'New'})  # type: ignore
+        self.client.delete(detail_url(deleted.id))  # type: ignore
+        created = create_recipe(user=self.user)
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        changed = [r['id'] for r in res.data['changed']]  # type: ignore
+        self.assertEqual(changed, [updated.id, created.id])  # type: ignore
+        self.assertNotIn(unchanged.id, changed)  # type: ignore
+        self.assertEqual(res.data['deleted'], [deleted.id])  # type: ignore
+
+    @override_settings(RECIPE_SYNC_PAGE_SIZE=2, RECIPE_SYNC_OVERLAP_SECONDS=0)
+    def test_sync_paged(self):
+        """Test a large sync is paged and the token comes with the last page."""
+        token = self.client.get(SYNC_URL).data['sync_token']  # type: ignore
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+        deleted = create_recipe(user=self.user)
+        self.client.delete(detail_url(deleted.id))  # type: ignore
+
+        first = self.client.get(SYNC_URL, {'since': token}).json()
+        second = self.client.get(first['next']).json()
+
+        self.assertEqual([r['id'] for r in first['changed']],
+                         [r.id for r in recipes[:2]])  # type: ignore
+        self.assertIsNone(first['sync_token'])
+        self.assertEqual(first['deleted'], [])
+        self.assertEqual([r['id'] for r in second['changed']],
+                         [recipes[2].id])  # type: ignore
+        self.assertEqual(second['deleted'], [deleted.id])  # type: ignore
+        self.assertIsNone(second['next'])
+        self.assertTrue(second['sync_token'])
+
+    def test_sync_invalid_cursor(self):
+        """Test an invalid sync cursor returns 400."""
+        res = self.client.get(SYNC_URL, {'cursor': '!!'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sync_invalid_token(self):
+        """Test an invalid sync token returns 400."""
+        res = self.client.get(SYNC_URL, {'since': '!!'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sync_expired_token(self):
+        """Test a token older than the tombstone retention returns 410."""
+        old = encode_token(timezone.now() - timedelta(days=365))
+
+        res = self.client.get(SYNC_URL, {'since': old})
+
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+
+    def test_deleting_user_leaves_no_tombstones(self):
+        """Test deleting an account does not leave tombstones behind."""
+        create_recipe(user=self.user)
+
+        self.user.delete()
+
+        self.assertFalse(RecipeTombstone.objects.exists())
+
+    def test_bulk_deleting_users_leaves_no_tombstones(self):
+        """Test deleting accounts through a queryset leaves no tombstones."""
+        create_recipe(user=self.user)
+        create_recipe(user=create_user(email='bulk-delete@example.com'))
+
+        get_user_model().objects.all().delete()
+
+        self.assertFalse(RecipeTombstone.objects.exists())
+
+    def test_bulk_create(self):
+        """Test creating many recipes with a single INSERT."""
+        payload = [
+            {'title': 'Soup %d' % i, 'time_minutes': 10, 'price': '2.50'}
+            for i in range(3)
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual([r.title for r in recipes], [p['title'] for p in payload])
+        inserts = [q for q in queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+
+    def test_bulk_create_invalid_item(self):
+        """Test an invalid item rejects the whole batch with per-item errors."""
+        payload = [
+            {'title': 'Soup', 'time_minutes': 10, 'price': '2.50'},
+            {'title': 'Broken', 'price': '2.50'},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})  # type: ignore
+        self.assertIn('time_minutes', res.data[1])  # type: ignore
+        self.assertFalse(Recipe.objects.exists())
+
+    @override_settings(RECIPE_BULK_MAX_ITEMS=2)
+    def test_bulk_create_limit(self):
+        """Test a batch larger than the limit is rejected."""
+        payload = [{'title': 'Soup', 'time_minutes': 1, 'price': '1.00'}] * 3
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update(self):
+        """Test partially updating many recipes."""
+        first = create_recipe(user=self.user)
+        second = create_recipe(user=self.user)
+        payload = [
+            {'id': first.id, 'title': 'First'},  # type: ignore
+            {'id': second.id, 'price': '9.99'},  # type: ignore
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.title, 'First')
+        self.assertEqual(second.price, Decimal('9.99'))
+        self.assertEqual(second.title, 'Sample Recipe')
+
+    def test_bulk_update_other_user_recipe(self):
+        """Test bulk update cannot touch another user's recipes."""
+        other_user = create_user(email='bulk@example.com',
+                                 password='test%pass$203')
+        mine = create_recipe(user=self.user)
+        theirs = create_recipe(user=other_user)
+        payload = [
+            {'id': mine.id, 'title': 'Mine'},  # type: ignore
+            {'id': theirs.id, 'title': 'Stolen'},  # type: ignore
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})  # type: ignore
+        self.assertIn('id', res.data[1])  # type: ignore
+        theirs.refresh_from_db()
+        mine.refresh_from_db()
+        self.assertEqual(theirs.title, 'Sample Recipe')
+        self.assertEqual(mine.title, 'Sample Recipe')
+
+    def test_bulk_update_duplicate_ids(self):
+        """Test a repeated id is rejected instead of applied twice."""
+        recipe = create_recipe(user=self.user)
+        payload = [
+            {'id': recipe.id, 'title': 'First'},  # type: ignore
+            {'id': recipe.id, 'title': 'Second'},  # type: ignore
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})  # type: ignore
+        self.assertEqual(res.data[1], {'id': ['Duplicate id.']})  # type: ignore
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Sample Recipe')
+
+    def test_bulk_update_invalid_ids(self):
+        """Test ids that are not in-range JSON integers are rejected."""
+        recipe = create_recipe(user=self.user)
+        payload = [
+            {'id': True, 'title': 'Bool'},
+            {'id': str(recipe.id), 'title': 'String'},  # type: ignore
+            {'id': 2**31, 'title': 'Huge'},
+            {'title': 'Missing'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data), 4)  # type: ignore
+        for error in res.data:  # type: ignore
+            self.assertEqual(list(error), ['id'])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Sample Recipe')
+
+    def test_bulk_delete(self):
+        """Test deleting many recipes leaves other users' recipes alone."""
+        other_user = create_user(email='bulk@example.com',
+                                 password='test%pass$203')
+        mine = create_recipe(user=self.user)
+        theirs = create_recipe(user=other_user)
+        ids = [mine.id, theirs.id]  # type: ignore
+
+        res = self.client.delete(BULK_URL, ids, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [  # type: ignore
+            {'id': mine.id, 'deleted': True},  # type: ignore
+            {'id': theirs.id, 'deleted': False},  # type: ignore
+        ])
+        self.assertFalse(Recipe.objects.filter(id=mine.id).exists())  # type: ignore
+        self.assertTrue(Recipe.objects.filter(id=theirs.id).exists())  # type: ignore
+        self.assertEqual(
+            list(RecipeTombstone.objects.values_list('recipe_id', flat=True)),
+            [mine.id],  # type: ignore
+        )
+
+    def test_bulk_delete_out_of_range_ids(self):
+        """Test ids too large for the primary key are a 400, not a query."""
+        recipe = create_recipe(user=self.user)
+        ids = [recipe.id, 2**31]  # type: ignore
+
+        res = self.client.delete(BULK_URL, ids, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())  # type: ignore
+
+    def test_export_ndjson(self):
+        """Test streaming recipes as NDJSON."""
+        recipes = [create_recipe(user=self.user, title='Dish %d' % i)
+                   for i in range(3)]
+        create_recipe(user=create_user(email='export@example.com',
+                                       password='test%pass$203'))
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        expected = RecipeDetailSerializer(reversed(recipes), many=True).data
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    def test_export_csv(self):
+        """Test streaming recipes as CSV."""
+        recipe = create_recipe(user=self.user, title='Dish, with comma')
+
+        res = self.client.get(EXPORT_URL, {'type': 'csv'})
+
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        content = b''.join(res.streaming_content).decode()
+        rows = list(csv.DictReader(content.splitlines()))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], str(recipe.id))  # type: ignore
+        self.assertEqual(rows[0]['title'], 'Dish, with comma')
+        self.assertEqual(rows[0]['price'], '5.25')
+
+    def test_export_invalid_type(self):
+        """Test an unknown export type is rejected."""
+        res = self.client.get(EXPORT_URL, {'type': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_title_and_description(self):
+        """Test searching matches the title or the description."""
+        soup = create_recipe(user=self.user, title='Tomato soup',
+                             description='Warm and simple')
+        salad = create_recipe(user=self.user, title='Green salad',
+                              description='Goes well with tomato soup')
+        create_recipe(user=self.user, title='Pancakes', description='Sweet')
+        create_recipe(
+            user=create_user(email='search@example.com', password='test%pass$203'),
+            title='Tomato soup',
+        )
+
+        res = self.client.get(RECIPE_URL, {'search': 'soup'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(r['id'] for r in res.data),  # type: ignore
+            sorted([soup.id, salad.id]),  # type: ignore
+        )
+
+    @unittest.skipUnless(connection.vendor == 'postgresql',
+                         'Relevance ranking needs PostgreSQL')
+    def test_search_ranks_title_matches_first(self):
+        """Test title matches rank above description matches."""
+        in_description = create_recipe(
+            user=self.user, title='Green salad', description='Tomato soup side')
+        in_title = create_recipe(user=self.user, title='Tomato soup')
+
+        res = self.client.get(RECIPE_URL, {'search': 'soup'})
+
+        self.assertEqual(
+            [r['id'] for r in res.data],  # type: ignore
+            [in_title.id, in_description.id],  # type: ignore
+        )
+
+    @unittest.skipUnless(connection.vendor == 'postgresql',
+                         'Relevance ranking needs PostgreSQL')
+    def test_search_pages_through_tied_ranks(self):
+        """Test paging search results with equal ranks skips and repeats none."""
+        recipes = [create_recipe(user=self.user, title='Tomato soup')
+                   for _ in range(7)]
+        create_recipe(user=self.user, title='Tomato soup', description='Soup')
+
+        seen = []
+        url = RECIPE_URL + '?search=soup&page_size=2'
+        while url:
+            page = self.client.get(url).json()
+            seen += [r['id'] for r in page['results']]
+            url = page['next']
+
+        self.assertEqual(len(seen), 8)
+        self.assertEqual(seen[1:], [r.id for r in reversed(recipes)])  # type: ignore
+
+    def test_autocomplete(self):
+        """Test autocomplete returns matching (id, title) pairs only."""
+        soup = create_recipe(user=self.user, title='Tomato soup')
+        create_recipe(user=self.user, title='Pancakes')
+        create_recipe(
+            user=create_user(email='auto@example.com', password='test%pass$203'),
+            title='Tomato salad',
+        )
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'tom'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [  # type: ignore
+            {'id': soup.id, 'title': 'Tomato soup'},  # type: ignore
+        ])
+
+    def test_autocomplete_limit(self):
+        """Test autocomplete returns at most `limit` results."""
+        for i in range(5):
+            create_recipe(user=self.user, title='Tomato %d' % i)
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'tomato', 'limit': 2})
+
+        self.assertEqual(len(res.data), 2)  # type: ignore
+
+    def test_autocomplete_empty_fragment(self):
+        """Test an empty fragment returns nothing without querying recipes."""
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': ' '})
+
+        self.assertEqual(res.data, [])  # type: ignore
+
+    def test_filter_by_price_and_time(self):
+        """Test filtering recipes by price and time ranges."""
+        cheap_quick = create_recipe(user=self.user, price=Decimal('2.00'),
+                                    time_minutes=10)
+        create_recipe(user=self.user, price=Decimal('2.00'), time_minutes=90)
+        create_recipe(user=self.user, price=Decimal('20.00'), time_minutes=10)
+
+        res = self.client.get(RECIPE_URL, {
+            'price_min': '1.00', 'price_max': '5.00', 'time_max': 30})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data],  # type: ignore
+                         [cheap_quick.id])  # type: ignore
+
+    def test_order_by_price_with_stable_tie_breaker(self):
+        """Test sorting by price pages through ties in id order."""
+        prices = ['3.00', '1.00', '3.00', '2.00', '3.00']
+        recipes = [create_recipe(user=self.user, price=Decimal(p))
+                   for p in prices]
+        expected = [r.id for r in sorted(  # type: ignore
+            recipes, key=lambda r: (-r.price, -r.id))]  # type: ignore
+
+        seen = []
+        url = RECIPE_URL + '?ordering=-price&page_size=2'
+        while url:
+            page = self.client.get(url).json()
+            seen += [r['id'] for r in page['results']]
+            url = page['next']
+
+        self.assertEqual(seen, expected)
+
+    def test_invalid_filters_rejected(self):
+        """Test invalid filter values and empty ranges return 400."""
+        for params in ({'price_min': 'abc'}, {'ordering': 'title'},
+                       {'time_min': 30, 'time_max': 10}):
+            res = self.client.get(RECIPE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sparse_fieldset_list(self):
+        """Test ?fields= trims the list output and the SQL columns."""
+        recipe = create_recipe(user=self.user, description='x' * 1000)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [  # type: ignore
+            {'id': recipe.id, 'title': recipe.title},  # type: ignore
+        ])
+        select = [q['sql'] for q in queries if 'FROM "core_recipe"' in q['sql']]
+        self.assertNotIn('"price"', select[-1])
+
+    def test_sparse_fieldset_detail_skips_description(self):
+        """Test the description is not read unless asked for."""
+        recipe = create_recipe(user=self.user)
+        url = detail_url(recipe.id)  # type: ignore
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, {'fields': 'title,price'})
+
+        self.assertEqual(res.data, {  # type: ignore
+            'title': recipe.title, 'price': '5.25'})
+        self.assertFalse(any('"description"' in q['sql'] for q in queries))
+
+    def test_sparse_fieldset_with_sorted_pages(self):
+        """Test a trimmed, sorted list can still be paged."""
+        for price in ('1.00', '2.00', '3.00'):
+            create_recipe(user=self.user, price=Decimal(price))
+
+        res = self.client.get(RECIPE_URL, {
+            'fields': 'title', 'ordering': 'price', 'page_size': 2})
+        page = self.client.get(res.data['next']).json()  # type: ignore
+
+        self.assertEqual(res.data['results'][0], {  # type: ignore
+            'title': 'Sample Recipe'})
+        self.assertEqual(len(page['results']), 1)
+
+    def test_sparse_fieldset_unknown_field(self):
+        """Test unknown fields are rejected."""
+        res = self.client.get(RECIPE_URL, {'fields': 'id,user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
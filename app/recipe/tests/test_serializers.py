@@ -0,0 +1,78 @@
+"""Tests for Recipe serializers."""
+import itertools
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Recipe
+from recipe.serializers import (
+    RecipeDetailSerializer,
+    RecipeFastSerializer,
+    RecipeSerializer,
+)
+
+
+class RecipeFastSerializerTests(TestCase):
+    """Check RecipeFastSerializer output matches the DRF serializers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(  # type: ignore
+            email='fast@example.com', password='fastpass#123')
+        samples = [
+            ('Plain', '', 0, Decimal('0'), ''),
+            ('Unicode é \U0001f35c', 'Line\nbreak "quoted"', 1,
+             Decimal('5.5'), 'http://example.com/a?b=c'),
+            ('Big', 'x' * 5000, 2 ** 31 - 1, Decimal('999.99'), ''),
+            ('Cents', '<b>html</b>', 15, Decimal('0.01'), ''),
+            ('Whole', 'Trailing space ', 45, Decimal('12'), ''),
+        ]
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=title, description=description,
+                   time_minutes=time_minutes, price=price, link=link)
+            for title, description, time_minutes, price, link in samples
+        )
+
+    def assertEquivalent(self, serializer_class, fields=None):
+        """Assert both serializers render byte-for-byte identical JSON."""
+        recipes = Recipe.objects.order_by('-id')
+        expected = serializer_class(recipes, many=True, fields=fields).data
+
+        fast = RecipeFastSerializer(serializer_class, fields=fields)
+        rows = recipes.values(*fast.fields)
+        actual = fast.many(rows)
+
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(actual), renderer.render(expected))
+        for row, item in zip(rows, expected):
+            self.assertEqual(renderer.render(fast.to_representation(row)),
+                             renderer.render(item))
+
+    def test_list_serializer_equivalent(self):
+        """Test the fast output matches RecipeSerializer."""
+        self.assertEquivalent(RecipeSerializer)
+
+    def test_detail_serializer_equivalent(self):
+        """Test the fast output matches RecipeDetailSerializer."""
+        self.assertEquivalent(RecipeDetailSerializer)
+
+    def test_sparse_fieldsets_equivalent(self):
+        """Test every subset of detail fields matches, in declared order."""
+        names = RecipeDetailSerializer.Meta.fields
+        for size in range(1, len(names) + 1):
+            for fields in itertools.combinations(reversed(names), size):
+                with self.subTest(fields=fields):
+                    self.assertEquivalent(RecipeDetailSerializer, list(fields))
+
+    def test_price_rounding_equivalent(self):
+        """Test decimals are quantized exactly like DecimalField does."""
+        fast = RecipeFastSerializer(RecipeSerializer, fields=['price'])
+        field = RecipeSerializer().fields['price']
+
+        for value in ('1.005', '2.675', '0.125', '-1.5', '7'):
+            self.assertEqual(
+                fast.to_representation({'price': Decimal(value)})['price'],
+                field.to_representation(Decimal(value)),
+            )
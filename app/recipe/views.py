@@ -1,17 +1,64 @@
 """Views for Recipe Api"""
-from rest_framework import viewsets
-from rest_framework.authentication import TokenAuthentication
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection, transaction
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import gettext as _
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.fields import IntegerField, ListField
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
-from core.models import Recipe
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from core.async_views import AsyncReadMixin
+from core.models import Recipe, RecipeTombstone
+from recipe import cache
 from recipe import serializers
+from recipe.export import csv_lines, ndjson_lines
+from recipe.filters import RecipeRangeFilter, RecipeSearchFilter
+from recipe.pagination import KeysetPagination
+from recipe.signals import batched_deletes, touch_recipes
+from recipe.sync import decode_cursor, decode_token, encode_cursor, encode_token
+from user.authentication import CachedTokenAuthentication
+
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def recipe_id_field():
+    """Return a field for ids that fit the recipe primary key column."""
+    return IntegerField(min_value=1, max_value=2**31 - 1)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+def validate_recipe_id(value):
+    """Return a valid recipe id, rejecting JSON types other than integers."""
+    field = recipe_id_field()
+    if type(value) is not int:
+        field.fail('invalid')
+    return field.run_validation(value)
+
+
+class RecipeViewSet(AsyncReadMixin, viewsets.ModelViewSet):
     """View for managing recipe apis"""
     serializer_class = serializers.RecipeDetailSerializer
-    queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    queryset = Recipe.objects.defer('search_vector')
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    filter_backends = [RecipeRangeFilter, RecipeSearchFilter]
+    # Bulk endpoints run a fixed number of queries however many rows change.
+    query_budget = 10
 
     def get_queryset(self):
         """Retrieve recipes for authenticated user"""
@@ -24,6 +71,386 @@ class RecipeViewSet(viewsets.ModelViewSet):
         else:
             return self.serializer_class
 
+    def get_requested_fields(self):
+        """Return the fields asked for with ?fields=, or None for all."""
+        param = self.request.query_params.get('fields')
+        if param is None or self.action not in ('list', 'retrieve'):
+            return None
+        fields = [name for name in param.split(',') if name]
+        allowed = self.get_serializer_class().Meta.fields
+        unknown = [name for name in fields if name not in allowed]
+        if unknown or not fields:
+            raise ValidationError({'fields': [
+                _('Must be a comma separated subset of: %s.')
+                % ', '.join(allowed)]})
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        """Return a serializer limited to the requested fields."""
+        kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        """Filter the queryset and only load the columns that are needed."""
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_requested_fields()
+        if fields is not None:
+            # Ordering keys stay loaded for the keyset pagination cursor.
+            columns = {f.name for f in Recipe._meta.concrete_fields}
+            ordering = [name.lstrip('-') for name in queryset.query.order_by]
+            queryset = queryset.only(
+                *[name for name in fields + ordering if name in columns])
+        return queryset
+
+    def get_fast_serializer(self):
+        """Return the read-only fast serializer for this action."""
+        return serializers.RecipeFastSerializer(
+            self.get_serializer_class(), fields=self.get_requested_fields())
+
+    def get_rows(self, serializer, queryset):
+        """Return `.values()` rows with the serialized and ordering columns."""
+        ordering = [name.lstrip('-') for name in queryset.query.order_by]
+        columns = serializer.fields + [
+            name for name in ordering if name not in serializer.fields]
+        return queryset.values(*columns)
+
+    def get_list_rows(self):
+        """Return the fast serializer and the filtered rows to serialize."""
+        serializer = self.get_fast_serializer()
+        rows = self.get_rows(
+            serializer, self.filter_queryset(self.get_queryset()))
+        return serializer, rows
+
+    def read_list(self, request, *args, **kwargs):
+        """List recipes straight from `.values()` rows."""
+        serializer, rows = self.get_list_rows()
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.many(page))
+        return Response(serializer.many(rows))
+
+    async def aread_list(self, request, *args, **kwargs):
+        """Async variant of `read_list`."""
+        serializer, rows = self.get_list_rows()
+        if self.paginator is not None:
+            page = await self.paginator.apaginate_queryset(
+                rows, request, view=self)
+            if page is not None:
+                return self.get_paginated_response(serializer.many(page))
+        return Response(serializer.many([row async for row in rows]))
+
+    def read_detail(self, request, *args, **kwargs):
+        """Retrieve a recipe straight from a `.values()` row."""
+        serializer, rows = self.get_list_rows()
+        row = get_object_or_404(rows, pk=self.kwargs['pk'])
+        return Response(serializer.to_representation(row))
+
+    async def aread_detail(self, request, *args, **kwargs):
+        """Async variant of `read_detail`."""
+        serializer, rows = self.get_list_rows()
+        try:
+            row = await rows.aget(pk=self.kwargs['pk'])
+        except (rows.model.DoesNotExist, TypeError, ValueError):
+            raise Http404
+        return Response(serializer.to_representation(row))
+
+    def list(self, request, *args, **kwargs):
+        """List recipes, served from the response cache when possible."""
+        return self.conditional(self.read_list, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        """Async variant of `list`, used when served over ASGI."""
+        return await self.aconditional(self.aread_list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Retrieve a recipe, served from the response cache when possible."""
+        return self.conditional(self.read_detail, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        """Async variant of `retrieve`, used when served over ASGI."""
+        return await self.aconditional(
+            self.aread_detail, request, *args, **kwargs)
+
+    def get_last_modified_queryset(self):
+        """Return a query for when the requested recipes last changed."""
+        if self.action == 'list':
+            return get_user_model().objects.filter(
+                pk=self.request.user.pk).values_list('recipes_modified_at')
+        try:
+            return self.get_queryset().filter(
+                pk=self.kwargs['pk']).values_list('updated_at')
+        except (TypeError, ValueError):
+            return None
+
+    def get_last_modified(self):
+        """Return when the requested recipes last changed, if they exist."""
+        queryset = self.get_last_modified_queryset()
+        row = queryset.first() if queryset is not None else None
+        return row[0] if row else None
+
+    async def aget_last_modified(self):
+        """Async variant of `get_last_modified`."""
+        queryset = self.get_last_modified_queryset()
+        row = await queryset.afirst() if queryset is not None else None
+        return row[0] if row else None
+
+    def get_validators(self, request, last_modified):
+        """Return the ETag and Last-Modified timestamp of a response."""
+        variant = '%s|%s|%s|%s' % (
+            request.user.pk,
+            last_modified.isoformat(),
+            request.get_full_path(),
+            request.accepted_media_type,
+        )
+        etag = quote_etag(hashlib.sha1(variant.encode()).hexdigest())
+        return etag, int(last_modified.timestamp())
+
+    def set_validators(self, response, etag, timestamp):
+        """Add the validators to a successful or not modified response."""
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def conditional(self, view, request, *args, **kwargs):
+        """Answer with 304 Not Modified if the client copy is current."""
+        last_modified = self.get_last_modified()
+        if last_modified is None:
+            return view(request, *args, **kwargs)
+
+        etag, timestamp = self.get_validators(request, last_modified)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = (self.cached_response(last_modified)
+                        or view(request, *args, **kwargs))
+        return self.set_validators(response, etag, timestamp)
+
+    async def aconditional(self, view, request, *args, **kwargs):
+        """Async variant of `conditional`."""
+        last_modified = await self.aget_last_modified()
+        if last_modified is None:
+            return await view(request, *args, **kwargs)
+
+        etag, timestamp = self.get_validators(request, last_modified)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = (await self.acached_response(last_modified)
+                        or await view(request, *args, **kwargs))
+        return self.set_validators(response, etag, timestamp)
+
+    def cached_response(self, last_modified):
+        """Return the cached response for this request, if any."""
+        key = cache.response_key(self.request, last_modified)
+        response = cache.get_response(key)
+        if response is None:
+            self.cache_key = key
+        return response
+
+    async def acached_response(self, last_modified):
+        """Async variant of `cached_response`."""
+        key = await cache.aresponse_key(self.request, last_modified)
+        response = await cache.aget_response(key)
+        if response is None:
+            self.cache_key = key
+        return response
+
+    def is_cacheable(self, response):
+        """Return whether the response should be stored in the cache."""
+        return bool(getattr(self, 'cache_key', None)
+                    and response.status_code == 200 and hasattr(response, 'render'))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Store successful list and detail responses in the cache."""
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.is_cacheable(response):
+            cache.set_response(self.cache_key, response)
+        return response
+
+    async def afinalize_response(self, request, response, *args, **kwargs):
+        """Async variant of `finalize_response`."""
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.is_cacheable(response):
+            await cache.aset_response(self.cache_key, response)
+        return response
+
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """Return recipes changed or deleted since a sync token.
+
+        Changes come in pages of RECIPE_SYNC_PAGE_SIZE recipes. Until the
+        last page, `next` links to the rest and `sync_token` is null; the
+        last page also lists the deleted ids.
+        """
+        changed = self.get_queryset().order_by('id')
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            started, last_id = decode_cursor(cursor)
+            changed = changed.filter(id__gt=last_id)
+        else:
+            started = timezone.now()
+        deleted = RecipeTombstone.objects.none()
+
+        token = request.query_params.get('since')
+        if token:
+            since = decode_token(token)
+            retention = datetime.timedelta(
+                days=settings.RECIPE_TOMBSTONE_RETENTION_DAYS)
+            if since < started - retention:
+                return Response(
+                    {'detail': _('Sync token expired, run a full sync.')},
+                    status=status.HTTP_410_GONE,
+                )
+            # Re-send a short overlap so writes still committing when the
+            # previous token was issued are not missed.
+            since -= datetime.timedelta(
+                seconds=settings.RECIPE_SYNC_OVERLAP_SECONDS)
+            changed = changed.filter(updated_at__gt=since)
+            deleted = RecipeTombstone.objects.filter(
+                user=request.user, deleted_at__gt=since).order_by('recipe_id')
+
+        page_size = settings.RECIPE_SYNC_PAGE_SIZE
+        # One extra row tells whether there is a next page.
+        page = list(changed[:page_size + 1])
+        if len(page) > page_size:
+            page = page[:page_size]
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'cursor',
+                encode_cursor(started, page[-1].id))
+            return Response({
+                'sync_token': None,
+                'changed': self.get_serializer(page, many=True).data,
+                'deleted': [],
+                'next': next_url,
+            })
+
+        return Response({
+            'sync_token': encode_token(started),
+            'changed': self.get_serializer(page, many=True).data,
+            'deleted': list(deleted.values_list('recipe_id', flat=True)),
+            'next': None,
+        })
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Return up to `limit` (id, title) pairs matching a title fragment."""
+        fragment = request.query_params.get('q', '').strip()
+        try:
+            limit = int(request.query_params.get(
+                'limit', settings.RECIPE_AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            raise ValidationError({'limit': [_('A valid integer is required.')]})
+        limit = max(1, min(limit, settings.RECIPE_AUTOCOMPLETE_MAX_LIMIT))
+        if not fragment:
+            return Response([])
+
+        matches = self.get_queryset()
+        if connection.vendor == 'postgresql' and len(fragment) >= 3:
+            # Served by the (user_id, title) trigram GIN index, see migration 0009.
+            matches = matches.filter(
+                title__trigram_word_similar=fragment,
+            ).annotate(
+                similarity=TrigramWordSimilarity(fragment, 'title'),
+            ).order_by('-similarity', '-id')
+        else:
+            matches = matches.filter(title__icontains=fragment)
+
+        return Response([
+            {'id': pk, 'title': title}
+            for pk, title in matches.values_list('id', 'title')[:limit]
+        ])
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream all recipes of the user as NDJSON or CSV."""
+        export_type = request.query_params.get('type', 'ndjson')
+        if export_type not in EXPORT_CONTENT_TYPES:
+            raise ValidationError({'type': [
+                _('Must be one of: %s.') % ', '.join(EXPORT_CONTENT_TYPES)]})
+
+        serializer = self.get_fast_serializer()
+        rows = self.get_rows(serializer, self.get_queryset()).iterator(
+            chunk_size=settings.RECIPE_EXPORT_CHUNK_SIZE)
+        rows = map(serializer.to_representation, rows)
+        if export_type == 'csv':
+            content = csv_lines(rows, serializer.fields)
+        else:
+            content = ndjson_lines(rows)
+
+        response = StreamingHttpResponse(
+            content, content_type=EXPORT_CONTENT_TYPES[export_type])
+        response['Content-Disposition'] = (
+            'attachment; filename="recipes.%s"' % export_type)
+        return response
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Create many recipes in one transaction."""
+        serializer = self.get_serializer(
+            data=request.data, many=True,
+            max_length=settings.RECIPE_BULK_MAX_ITEMS)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save(user=request.user)
+            self.bulk_changed()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @bulk.mapping.patch
+    def bulk_update(self, request):
+        """Partially update many recipes in one transaction."""
+        items = ListField(
+            max_length=settings.RECIPE_BULK_MAX_ITEMS,
+        ).run_validation(request.data)
+        ids = []
+        errors = []
+        for item in items:
+            try:
+                ids.append(validate_recipe_id(
+                    item.get('id') if isinstance(item, dict) else None))
+                errors.append({})
+            except ValidationError as exc:
+                ids.append(None)
+                errors.append({'id': exc.detail})
+        recipes = self.get_queryset().in_bulk(
+            [pk for pk in ids if pk is not None])
+        seen = set()
+        for pk, error in zip(ids, errors):
+            if error:
+                continue
+            if pk not in recipes:
+                error['id'] = [_('Not found.')]
+            elif pk in seen:
+                error['id'] = [_('Duplicate id.')]
+            seen.add(pk)
+        if any(errors):
+            raise ValidationError(errors)
+
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in ids], data=items, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            serializer.save()
+            self.bulk_changed()
+        return Response(serializer.data)
+
+    @bulk.mapping.delete
+    def bulk_destroy(self, request):
+        """Delete many recipes with a single DELETE."""
+        ids = ListField(
+            child=recipe_id_field(),
+            max_length=settings.RECIPE_BULK_MAX_ITEMS,
+        ).run_validation(request.data)
+        with transaction.atomic(), batched_deletes() as deleted:
+            self.get_queryset().filter(id__in=ids).delete()
+
+        deleted_ids = {recipe_id for _user_id, recipe_id in deleted}
+        return Response([{'id': pk, 'deleted': pk in deleted_ids} for pk in ids])
+
+    def bulk_changed(self):
+        """Record a bulk write, which bypasses the model signals."""
+        touch_recipes(self.request.user.pk)
+
     def perform_create(self, serializer):
         """Create a Recipe."""
         serializer.save(user=self.request.user)
@@ -0,0 +1,193 @@
+"""Authentication for user api"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext as _
+from rest_framework import authentication, exceptions
+
+from core import metrics
+
+
+class TokenCache:
+    """Bounded LRU of token key -> (user, token) with a TTL.
+
+    When TOKEN_AUTH_CACHE_ALIAS names a Django cache, entries are kept there
+    instead so invalidation is seen by every process sharing that cache.
+    """
+    prefix = 'auth:token'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def cache_key(self, key):
+        """Return the cache key for a token without exposing the token."""
+        return '%s:%s' % (self.prefix, hashlib.sha256(key.encode()).hexdigest())
+
+    @property
+    def ttl(self):
+        return settings.TOKEN_AUTH_CACHE_TTL
+
+    @property
+    def shared(self):
+        alias = settings.TOKEN_AUTH_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        """Return the cached (user, token) pair or None."""
+        if self.shared is not None:
+            return self.shared.get(self.cache_key(key))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def aget(self, key):
+        """Async variant of `get`, not blocking on a shared cache."""
+        if self.shared is not None:
+            return await self.shared.aget(self.cache_key(key))
+        return self.get(key)
+
+    def set(self, key, value):
+        """Cache the (user, token) pair for the token key."""
+        ttl = self.ttl
+        if self.shared is not None:
+            self.shared.set(self.cache_key(key), value, ttl)
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.TOKEN_AUTH_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    async def aset(self, key, value):
+        """Async variant of `set`, not blocking on a shared cache."""
+        if self.shared is not None:
+            await self.shared.aset(self.cache_key(key), value, self.ttl)
+            return
+        self.set(key, value)
+
+    def delete(self, key):
+        """Drop the cached entry for the token key."""
+        if self.shared is not None:
+            self.shared.delete(self.cache_key(key))
+            return
+
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop every entry held in this process."""
+        with self._lock:
+            self._entries.clear()
+
+
+class IssuedTokenCache(TokenCache):
+    """Short-lived user id -> token key cache for the login endpoint."""
+    prefix = 'auth:issued'
+
+    @property
+    def ttl(self):
+        return settings.LOGIN_TOKEN_CACHE_TTL
+
+
+token_cache = TokenCache()
+issued_tokens = IssuedTokenCache()
+
+
+class CachedTokenAuthentication(authentication.TokenAuthentication):
+    """Token authentication that caches token -> user lookups."""
+
+    async def aauthenticate(self, request):
+        """Async variant of `authenticate`, loading tokens with the async ORM."""
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            msg = _('Invalid token header. No credentials provided.')
+            raise exceptions.AuthenticationFailed(msg)
+        elif len(auth) > 2:
+            msg = _('Invalid token header. Token string should not contain spaces.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            msg = _('Invalid token header. '
+                    'Token string should not contain invalid characters.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        cached = await self.aget_cached_credentials(key)
+        if cached is None:
+            model = self.get_model()
+            try:
+                token = await model.objects.select_related('user').aget(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            cached = await self.acache_credentials(key, token)
+        return self.check_credentials(*cached)
+
+    def authenticate_credentials(self, key):
+        """Return the cached user for the token, loading it on a miss."""
+        cached = self.get_cached_credentials(key)
+        if cached is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            cached = self.cache_credentials(key, token)
+        return self.check_credentials(*cached)
+
+    def get_cached_credentials(self, key):
+        """Return the cached (user, token) pair for the key, or None."""
+        cached = token_cache.get(key)
+        metrics.increment('token_auth_cache_%s_total' % (
+            'misses' if cached is None else 'hits'))
+        return cached
+
+    async def aget_cached_credentials(self, key):
+        """Async variant of `get_cached_credentials`."""
+        cached = await token_cache.aget(key)
+        metrics.increment('token_auth_cache_%s_total' % (
+            'misses' if cached is None else 'hits'))
+        return cached
+
+    def cache_credentials(self, key, token):
+        """Cache and return the (user, token) pair of a loaded token."""
+        cached = (token.user, token)
+        token_cache.set(key, cached)
+        return cached
+
+    async def acache_credentials(self, key, token):
+        """Async variant of `cache_credentials`."""
+        cached = (token.user, token)
+        await token_cache.aset(key, cached)
+        return cached
+
+    def check_credentials(self, user, token):
+        """Return a copy of the (user, token) pair if the user may authenticate.
+
+        The cached instances are shared by every request of this process, so
+        each request gets copies it can change, e.g. when updating a profile.
+        """
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        user, token = copy.copy(user), copy.copy(token)
+        token.user = user
+        return (user, token)
@@ -20,16 +20,24 @@ class UserSerializer(serializers.ModelSerializer):
         return get_user_model().objects.create_user(**validated_data)  # type: ignore
 
     def update(self, instance, validated_data):
-        """Update data and return user."""
+        """Update data and return user.
+
+        Only the changed fields are saved, so a stale instance never writes
+        back columns other requests maintain, such as recipes_modified_at.
+        """
         # User may not want to update password but other data
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        update_fields = list(validated_data)
 
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
+            update_fields.append('password')
 
-        return user
+        if update_fields:
+            instance.save(update_fields=update_fields)
+        return instance
 
 
 class AuthTokenSerializer(serializers.Serializer):
@@ -0,0 +1,23 @@
+"""Signal handlers keeping the token caches in sync."""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import issued_tokens, token_cache
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Forget a token once it is deleted."""
+    token_cache.delete(instance.key)
+    issued_tokens.delete(str(instance.user_id))
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, update_fields=None, **kwargs):
+    """Forget cached tokens of a user that was updated or deactivated."""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+        token_cache.delete(key)
@@ -0,0 +1,263 @@
+"""Tests for cached token authentication."""
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.checks import check_login_throttle_rates
+from core.middleware import ReplicaRoutingMiddleware
+from user.authentication import (
+    CachedTokenAuthentication,
+    issued_tokens,
+    token_cache,
+)
+from user.throttling import login_buckets
+
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token')
+
+
+def create_user(**params):
+    return get_user_model().objects.create_user(**params)  # type: ignore
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Tests for CachedTokenAuthentication."""
+
+    def setUp(self) -> None:
+        token_cache.clear()
+        metrics.reset()
+        self.user = create_user(
+            email='cache@example.com',
+            password='CachePass#123',
+            name='Cache',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+    def test_token_lookup_is_cached(self):
+        """Test a repeat request does not query the token table."""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(metrics.get('token_auth_cache_hits_total'), 1)
+        self.assertEqual(metrics.get('token_auth_cache_misses_total'), 1)
+
+    def test_requests_get_their_own_user(self):
+        """Test a cached user is copied, not shared between requests."""
+        auth = CachedTokenAuthentication()
+        first, token = auth.authenticate_credentials(self.token.key)
+        first.name = 'Changed in one request'
+        second, _token = auth.authenticate_credentials(self.token.key)
+
+        self.assertIsNot(first, second)
+        self.assertEqual(second.name, 'Cache')
+        self.assertIs(token.user, first)
+
+    def test_password_change_is_invalidated(self):
+        """Test changing the password drops the cached user."""
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'password': 'ChangedPass#123'})
+
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_deleted_token_is_invalidated(self):
+        """Test a deleted token stops authenticating."""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_invalidated(self):
+        """Test a deactivated user stops authenticating."""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_is_visible(self):
+        """Test an update via the me endpoint is not served stale."""
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'Updated'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Updated')  # type: ignore
+
+    @override_settings(TOKEN_AUTH_CACHE_SIZE=1)
+    def test_cache_is_bounded(self):
+        """Test the least recently used token is evicted."""
+        other = create_user(email='other@example.com', password='OtherPass#123')
+        other_token = Token.objects.create(user=other)
+        self.client.get(ME_URL)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + other_token.key)
+        self.client.get(ME_URL)
+
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertIsNotNone(token_cache.get(other_token.key))
+
+    def test_cache_entries_expire(self):
+        """Test entries are dropped after the TTL."""
+        self.client.get(ME_URL)
+
+        with patch('user.authentication.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(token_cache.get(self.token.key))
+
+    @override_settings(
+        TOKEN_AUTH_CACHE_ALIAS='default',
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }},
+    )
+    def test_shared_cache_backend(self):
+        """Test lookups can be kept in a Django cache."""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            self.client.get(ME_URL)
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class CreateTokenViewTests(TestCase):
+    """Tests for login throttling and the issued token cache."""
+
+    def setUp(self) -> None:
+        login_buckets.clear()
+        issued_tokens.clear()
+        metrics.reset()
+        self.user = create_user(email='login@example.com', password='LoginPass#123')
+        self.payload = {'email': 'login@example.com', 'password': 'LoginPass#123'}
+        self.client = APIClient()
+
+    def test_issued_token_is_cached(self):
+        """Test a repeat login reuses the token without touching the table."""
+        first = self.client.post(TOKEN_URL, self.payload)
+
+        with patch('user.views.Token.objects.get_or_create') as get_or_create:
+            second = self.client.post(TOKEN_URL, self.payload)
+
+        get_or_create.assert_not_called()
+        self.assertEqual(second.data['token'], first.data['token'])  # type: ignore
+        self.assertEqual(metrics.get('login_token_cache_hits_total'), 1)
+        self.assertEqual(metrics.get('login_token_cache_misses_total'), 1)
+
+    @override_settings(DB_REPLICAS=['replica1'])
+    def test_issued_token_pinned_to_primary(self):
+        """Test the first request with a new token reads from the primary."""
+        cache.clear()
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        request = RequestFactory().get(
+            ME_URL, HTTP_AUTHORIZATION='Token ' + res.data['token'])  # type: ignore
+        keys = ReplicaRoutingMiddleware(lambda r: None).get_client_keys(request)
+        self.assertTrue(cache.get_many(keys))
+
+    def test_deleted_token_not_reissued(self):
+        """Test a deleted token is dropped from the issued token cache."""
+        first = self.client.post(TOKEN_URL, self.payload)
+        Token.objects.filter(user=self.user).delete()
+
+        second = self.client.post(TOKEN_URL, self.payload)
+
+        key = second.data['token']  # type: ignore
+        self.assertNotEqual(key, first.data['token'])  # type: ignore
+        self.assertTrue(Token.objects.filter(key=key).exists())
+
+    @override_settings(LOGIN_THROTTLE_RATES={'ip': (100, 60), 'email': (2, 1)})
+    def test_email_throttled_before_hashing(self):
+        """Test attempts beyond the email burst are refused unhashed."""
+        bad = {'email': 'LOGIN@example.com', 'password': 'wrong'}
+        for _ in range(2):
+            res = self.client.post(TOKEN_URL, bad)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with patch('core.hashing.pool.run') as run:
+            res = self.client.post(TOKEN_URL, self.payload)
+
+        run.assert_not_called()
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '60')
+        self.assertEqual(metrics.get('login_throttle_rejected_email_total'), 1)
+        self.assertEqual(metrics.get('login_throttle_allowed_total'), 2)
+
+    @override_settings(LOGIN_THROTTLE_RATES={'ip': (1, 60), 'email': (100, 60)})
+    def test_ip_throttled(self):
+        """Test attempts beyond the IP burst are refused for any email."""
+        self.client.post(TOKEN_URL, self.payload)
+
+        res = self.client.post(TOKEN_URL, {'email': 'x@example.com', 'password': 'x'})
+        other = self.client.post(TOKEN_URL, self.payload, REMOTE_ADDR='10.0.0.2')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other.status_code, status.HTTP_200_OK)
+        self.assertEqual(metrics.get('login_throttle_rejected_ip_total'), 1)
+
+    @override_settings(LOGIN_THROTTLE_RATES={'ip': (1, 60), 'email': (100, 60)})
+    def test_forwarded_for_ignored(self):
+        """Test a forged X-Forwarded-For does not give a fresh IP bucket."""
+        self.client.post(TOKEN_URL, self.payload, HTTP_X_FORWARDED_FOR='1.1.1.1')
+
+        res = self.client.post(TOKEN_URL, {'email': 'x@example.com', 'password': 'x'},
+                               HTTP_X_FORWARDED_FOR='2.2.2.2')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(LOGIN_THROTTLE_RATES={'ip': (100, 60), 'email': (1, 60)})
+    def test_bucket_refills(self):
+        """Test a bucket allows requests again after its refill time."""
+        self.client.post(TOKEN_URL, self.payload)
+        now = time.time()
+
+        with patch('user.throttling.time.time', return_value=now + 1.5):
+            res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(
+        LOGIN_THROTTLE_CACHE_ALIAS='default',
+        LOGIN_THROTTLE_RATES={'ip': (100, 60), 'email': (1, 1)},
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }},
+    )
+    def test_shared_cache_buckets(self):
+        """Test buckets can be kept in a Django cache."""
+        self.client.post(TOKEN_URL, self.payload)
+        login_buckets.clear()
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class LoginThrottleRatesCheckTests(SimpleTestCase):
+    """Tests for the login throttle rates system check."""
+
+    def test_rates_must_be_positive(self):
+        """Test a zero burst or refill rate is reported at startup."""
+        with override_settings(LOGIN_THROTTLE_RATES={'ip': (30, 30)}):
+            self.assertEqual(check_login_throttle_rates(None), [])
+        for rate in ((30, 0), (0, 30), (30, -1)):
+            with self.subTest(rate=rate):
+                with override_settings(LOGIN_THROTTLE_RATES={'ip': rate}):
+                    errors = check_login_throttle_rates(None)
+                self.assertEqual([error.id for error in errors], ['core.E002'])
@@ -4,6 +4,8 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
+from user.authentication import issued_tokens
+from user.throttling import login_buckets
 
 
 CREATE_USER_URL = reverse('user:create')
@@ -19,6 +21,8 @@ class PublicUserApiTest(TestCase):
     """Tests for Public User Api"""
 
     def setUp(self) -> None:
+        login_buckets.clear()
+        issued_tokens.clear()
         self.client = APIClient()
 
     def test_create_user_success(self):
@@ -159,3 +163,19 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_profile_update_keeps_recipe_watermark(self):
+        """Test updating the profile does not roll back the recipe ETag.
+
+        The authenticated user instance predates the recipe write.
+        """
+        recipe_url = reverse('recipe:recipe-list')
+        etag = self.client.get(recipe_url)['ETag']
+        self.client.post(recipe_url, {
+            'title': 'New', 'time_minutes': 5, 'price': '1.00'})
+        self.client.patch(ME_URL, {'name': 'Renamed'})
+
+        res = self.client.get(recipe_url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['title'] for r in res.json()], ['New'])
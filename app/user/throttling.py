@@ -0,0 +1,101 @@
+"""Throttling for user api"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+from core import metrics
+
+
+class TokenBuckets:
+    """Token buckets by key, kept in process or in a Django cache.
+
+    When LOGIN_THROTTLE_CACHE_ALIAS names a Django cache the buckets are
+    shared between processes. Updates there are read-modify-write without a
+    lock, so concurrent requests may occasionally both get the last token.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    @property
+    def shared(self):
+        alias = settings.LOGIN_THROTTLE_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def take(self, key, capacity, per_second):
+        """Take a token from the bucket, return seconds to wait if empty."""
+        key = 'throttle:login:%s' % hashlib.sha256(key.encode()).hexdigest()
+        if self.shared is not None:
+            state = self.shared.get(key)
+            state, wait = self.refill(state, capacity, per_second)
+            self.shared.set(key, state, int(capacity / per_second) + 1)
+            return wait
+
+        with self._lock:
+            state, wait = self.refill(
+                self._buckets.get(key), capacity, per_second)
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > settings.LOGIN_THROTTLE_MAX_KEYS:
+                self._buckets.popitem(last=False)
+            return wait
+
+    @staticmethod
+    def refill(state, capacity, per_second):
+        """Return the new (tokens, timestamp) state and the wait in seconds."""
+        now = time.time()
+        tokens, updated = state if state is not None else (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * per_second)
+        if tokens >= 1:
+            return (tokens - 1, now), 0
+        return (tokens, now), (1 - tokens) / per_second
+
+    def clear(self):
+        """Drop every bucket held in this process."""
+        with self._lock:
+            self._buckets.clear()
+
+
+login_buckets = TokenBuckets()
+
+
+class LoginRateThrottle(BaseThrottle):
+    """Token-bucket limits on login attempts per email and per client IP.
+
+    Runs before the credentials are checked, so rejected attempts cost no
+    password hashing.
+    """
+
+    def get_idents(self, request):
+        """Return the (scope, ident) pairs the request is limited by."""
+        idents = [('ip', self.get_ident(request) or '')]
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if isinstance(email, str) and email.strip():
+            idents.append(('email', email.strip().lower()))
+        return idents
+
+    def allow_request(self, request, view):
+        """Take a token from every bucket of the request."""
+        self.delay = 0
+        for scope, ident in self.get_idents(request):
+            capacity, per_minute = settings.LOGIN_THROTTLE_RATES[scope]
+            wait = login_buckets.take(
+                '%s:%s' % (scope, ident), capacity, per_minute / 60)
+            if wait:
+                metrics.increment('login_throttle_rejected_%s_total' % scope)
+            self.delay = max(self.delay, wait)
+
+        if self.delay:
+            metrics.increment('login_throttle_rejected_total')
+            return False
+        metrics.increment('login_throttle_allowed_total')
+        return True
+
+    def wait(self):
+        return self.delay
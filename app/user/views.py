@@ -1,13 +1,19 @@
 """Views for the user api."""
 from rest_framework import (
     generics,
-    authentication,
     permissions
 )
+from rest_framework.response import Response
+from core import metrics
+from core.async_views import AsyncReadMixin
+from core.db.routers import pin_authorization
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer
 )
+from user.authentication import CachedTokenAuthentication, issued_tokens
+from user.throttling import LoginRateThrottle
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
@@ -15,20 +21,48 @@ from rest_framework.settings import api_settings
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system."""
     serializer_class = UserSerializer
+    query_budget = 5
 
 
 class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = [LoginRateThrottle]
+    # Includes upgrading an outdated password hash.
+    query_budget = 8
 
+    def post(self, request, *args, **kwargs):
+        """Return the user's token, reusing a recently issued one."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+        key = issued_tokens.get(str(user.pk))
+        if key is not None:
+            metrics.increment('login_token_cache_hits_total')
+        else:
+            metrics.increment('login_token_cache_misses_total')
+            key = Token.objects.get_or_create(user=user)[0].key
+            issued_tokens.set(str(user.pk), key)
+        # The token may only be on the primary yet.
+        pin_authorization(
+            request._request, '%s %s' % (CachedTokenAuthentication.keyword, key))
+        return Response({'token': key})
+
+
+class ManageUserView(AsyncReadMixin, generics.RetrieveUpdateAPIView):
     """Manage the authenticated use."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = 5
 
     def get_object(self):
         """Retreive and return authenticated user."""
         return self.request.user
+
+    async def aget(self, request, *args, **kwargs):
+        """Async GET, the user was already loaded by authentication."""
+        serializer = self.get_serializer(self.get_object())
+        return Response(serializer.data)